@@ -0,0 +1,230 @@
+#!python/bin/python3
+"""
+Copyright (c) 2018 NSF Center for Space, High-performance, and Resilient Computing (SHREC)
+University of Pittsburgh. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided
+that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice,
+   this list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY EXPRESS OR IMPLIED WARRANTIES, 
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. 
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR 
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT 
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY
+OF SUCH DAMAGE.
+"""
+
+# compares the config parser of src/simics/config.py with the PLY grammar it
+# replaced, usage: scripts/benchmark_config.py CHECKPOINT [CHECKPOINT ...]
+# (e.g. gold checkpoints of a p2020 campaign with caches)
+# requires ply, which scripts/setup_environment.sh still installs only for this
+# script, since DrSEUs itself no longer uses it
+
+from importlib.util import module_from_spec, spec_from_file_location
+from os.path import abspath, dirname
+from ply import lex, yacc
+from sys import argv
+from time import perf_counter
+
+# loaded by itself to avoid setting up django for the src package
+spec = spec_from_file_location('config', '{}/src/simics/config.py'.format(
+    dirname(dirname(abspath(__file__)))))
+config = module_from_spec(spec)
+spec.loader.exec_module(config)
+config_parser = config.config_parser
+data_list = config.data_list
+
+
+# LEX
+tokens = ('COMMENT', 'COLON', 'COMMA', 'ID', 'LBRAC', 'LINECOMMENT', 'LPAR',
+          'OBJECT', 'DATASTART', 'DATAEND', 'RBRAC', 'RPAR', 'STRING', 'TYPE')
+
+t_LPAR = r'\('
+t_RPAR = r'\)'
+t_LBRAC = r'{'
+t_RBRAC = r'}'
+t_COLON = r':'
+t_COMMA = r','
+t_DATAEND = r']'
+t_DATASTART = r'\['
+t_STRING = r'"(?:[^"\\]|\\.)*"'
+
+
+# use functions for most tokens to keep parse order
+def t_COMMENT(t):
+    r'/\*.*?\*/'
+    pass
+
+
+def t_LINECOMMENT(t):
+    r'\#.*\n'
+    pass
+
+
+def t_ID(t):
+    r'(\.|[A-Za-z0-9+/_*-]|\[[0-9]+\])+'
+    if t.value in ['OBJECT', 'TYPE']:
+        t.type = t.value
+    return t
+
+
+def t_newline(t):
+    r'\n+'
+    t.lineno += len(t.value)
+
+
+t_ignore = ' \t\r'
+
+
+def t_error(t):
+    print('Illegal character "{}"'.format(t.value[0]))
+    t.skip(1)
+
+
+# YACC
+def p_configuration(p):
+    'configuration : objects'
+    p[0] = p[1]
+
+
+def p_objects(p):
+    'objects : objects object'
+    (name, typ, attrs) = p[2]
+    p[0] = p[1]
+    p[0][name] = (typ, attrs)
+
+
+def p_objects_empty(p):
+    'objects : empty'
+    p[0] = {}
+
+
+def p_object(p):
+    'object : OBJECT ID TYPE ID LBRAC attributes RBRAC'
+    p[0] = (p[2], p[4], p[6])
+
+
+def p_attributes(p):
+    'attributes : attributes attribute'
+    (name, value) = p[2]
+    p[0] = p[1]
+    p[0][name] = value
+
+
+def p_attributes_empty(p):
+    'attributes : empty'
+    p[0] = {}
+
+
+def p_attribute(p):
+    'attribute : ID COLON value'
+    p[0] = (p[1], p[3])
+
+
+def p_value_id(p):
+    'value : ID'
+    p[0] = p[1]
+
+
+def p_value_string(p):
+    'value : STRING'
+    p[0] = p[1]
+
+
+def p_value_data(p):
+    'value : DATASTART datalist DATAEND'
+    p[0] = p[2]
+
+
+def p_datalist(p):
+    'datalist : datalist ID'
+    p[0] = data_list(p[1] + [p[2]])
+
+
+def p_datalist_empty(p):
+    'datalist : empty'
+    p[0] = data_list()
+
+
+def p_value_list(p):
+    'value : LPAR valuelist RPAR'
+    p[0] = p[2]
+
+
+def p_valuelist(p):
+    'valuelist : valuelist COMMA value'
+    p[0] = p[1]
+    p[0].append(p[3])
+
+
+def p_valuelist_value(p):
+    'valuelist : value'
+    p[0] = [p[1]]
+
+
+def p_valuelist_empty(p):
+    'valuelist : empty'
+    p[0] = []
+
+
+def p_value_dict(p):
+    'value : LBRAC pairs RBRAC'
+    p[0] = p[2]
+
+
+def p_pairs(p):
+    'pairs : pairs COMMA pair'
+    p[0] = p[1].copy()
+    p[0].update(p[3])
+
+
+def p_pairs_pair(p):
+    'pairs : pair'
+    p[0] = p[1]
+
+
+def p_pair(p):
+    'pair : value COLON value'
+    p[0] = {p[1]: p[3]}
+
+
+def p_pair_empty(p):
+    'pair : empty'
+    p[0] = {}
+
+
+def p_empty(p):
+    'empty :'
+    pass
+
+
+# dummy rule to avoid unused warnings
+def p_dummy(p):
+    'configuration : COMMENT LINECOMMENT'
+    pass
+
+
+def p_error(p):
+    raise Exception('syntax error: {}'.format(p))
+
+
+lex.lex(debug=0)
+ply_parser = yacc.yacc(debug=0, write_tables=False)
+
+for checkpoint in argv[1:]:
+    with open('{}/config'.format(checkpoint), 'r') as config_file:
+        contents = config_file.read()
+    start = perf_counter()
+    ply_config = ply_parser.parse(contents)
+    ply_time = perf_counter() - start
+    start = perf_counter()
+    new_config = config_parser(contents).parse()
+    new_time = perf_counter() - start
+    print('{}: {:.0f} KB, PLY {:.3f} s, new {:.3f} s ({:.1f}x){}'.format(
+        checkpoint, len(contents)/1024, ply_time, new_time,
+        ply_time/new_time, '' if new_config == ply_config else ', MISMATCH'))
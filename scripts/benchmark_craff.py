@@ -0,0 +1,87 @@
+#!python/bin/python3
+"""
+Copyright (c) 2018 NSF Center for Space, High-performance, and Resilient Computing (SHREC)
+University of Pittsburgh. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided
+that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice,
+   this list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY EXPRESS OR IMPLIED WARRANTIES, 
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. 
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR 
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT 
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY
+OF SUCH DAMAGE.
+"""
+
+# compares the memory-mapped craff_image differ of src/simics/craff.py with the
+# craff --diff/--content-map/--info commands it replaced, usage (from the
+# Simics workspace): benchmark_craff.py GOLD_IMAGE MONITORED_IMAGE [...]
+# where images are given in pairs, e.g. the RAM images of a merged gold
+# checkpoint and of a merged monitored checkpoint
+
+from importlib.util import module_from_spec, spec_from_file_location
+from os import getcwd, remove
+from os.path import abspath, dirname
+from re import findall
+from subprocess import check_call, check_output, DEVNULL
+from sys import argv
+from time import perf_counter
+
+# loaded by itself to avoid setting up django for the src package
+spec = spec_from_file_location('craff', '{}/src/simics/craff.py'.format(
+    dirname(dirname(abspath(__file__)))))
+craff = module_from_spec(spec)
+spec.loader.exec_module(craff)
+cwd = getcwd()
+craff_utility = '{}/bin/craff'.format(cwd)
+
+
+def craff_diff(gold_image, monitored_image):
+    """
+    Returns the changed blocks and the block size found with the craff
+    utility the way compare_memory() used to.
+    """
+    diff = '{}.diff'.format(monitored_image)
+    content_map = '{}.content_map'.format(diff)
+    check_call([craff_utility, '--diff', gold_image, monitored_image,
+                '--output={}'.format(diff)], cwd=cwd, stdout=DEVNULL)
+    check_call([craff_utility, '--content-map', diff,
+                '--output={}'.format(content_map)], cwd=cwd, stdout=DEVNULL)
+    craff_output = check_output([craff_utility, '--info', diff], cwd=cwd,
+                                universal_newlines=True)
+    block_size = int(findall(r'\d+', craff_output.split('\n')[2])[1])
+    changed_blocks = []
+    with open(content_map, 'r') as content_map_file:
+        for line in content_map_file:
+            if 'empty' not in line:
+                line = line.split()
+                base_address = int(line[0], 16)
+                changed_blocks.extend(
+                    base_address+offset*block_size
+                    for offset, value in enumerate(line[1]) if value == 'D')
+    remove(diff)
+    remove(content_map)
+    return changed_blocks, block_size
+
+
+for gold_image, monitored_image in zip(argv[1::2], argv[2::2]):
+    start = perf_counter()
+    old_blocks, block_size = craff_diff(gold_image, monitored_image)
+    old_time = perf_counter() - start
+    start = perf_counter()
+    with craff.craff_image(gold_image, cwd) as gold, \
+            craff.craff_image(monitored_image, cwd) as monitored:
+        new_blocks = craff.diff_images(gold, monitored, block_size)
+        sparse = gold.sparse and monitored.sparse
+    new_time = perf_counter() - start
+    print('{}: {} changed blocks, craff {:.3f} s, mmap {:.3f} s ({:.1f}x, '
+          '{}){}'.format(
+              monitored_image, len(old_blocks), old_time, new_time,
+              old_time/new_time, 'sparse' if sparse else 'not sparse',
+              '' if sorted(old_blocks) == new_blocks else ', MISMATCH'))
@@ -460,6 +460,28 @@ new_simics_campaign.add_argument(
     default=1000,
     help='number of gold checkpoints to target for creation '
          '(actual number of checkpoints may be different) [default=1000]')
+new_simics_campaign.add_argument(
+    '--gold_workers',
+    type=int,
+    metavar='WORKERS',
+    help='create gold checkpoints in parallel with WORKERS Simics processes, '
+         'only every CHECKPOINTS/WORKERS checkpoints are written while running '
+         'the application and a worker creating the checkpoints between two '
+         'of them is started as soon as both are written (results are '
+         'verified to be deterministic)')
+new_simics_campaign.add_argument(
+    '--merge_gold',
+    type=int,
+    metavar='PROCESSES',
+    help='merge every gold checkpoint after creating them using PROCESSES '
+         'parallel merge processes (otherwise gold checkpoints are merged '
+         'when first compared)')
+new_simics_campaign.add_argument(
+    '--reuse_gold',
+    action='store_true',
+    help='store the gold checkpoints and reuse them (instead of timing the '
+         'application and creating them again) for new campaigns with the '
+         'same files, command and settings')
 new_campaign.set_defaults(func='create_campaign')
 
 inject = subparsers.add_parser(
@@ -512,6 +534,19 @@ inject.add_argument(
     '--log_delay',
     type=float,
     help='periodically retrieve log files from DUT every X seconds')
+inject.add_argument(
+    '--adaptive_timeout',
+    type=float,
+    metavar='K',
+    help='wait at most K times the slowest gold execution (plus a margin) '
+         'for the output of each injection instead of the device read '
+         'timeout, which also derives the Simics timeouts')
+inject.add_argument(
+    '--timeout_margin',
+    type=float,
+    metavar='SECONDS',
+    default=30,
+    help='margin added to adaptive timeouts [default=30]')
 inject.add_argument(
     '-p', '--processes',
     type=int,
@@ -524,9 +559,103 @@ inject_simics = inject.add_argument_group(
 inject_simics.add_argument(
     '-a', '--compare_all',
     action='store_true',
-    help='monitor all checkpoints (only last by default), '
-         'IMPORTANT: do NOT use with "-p" or "--processes" when using this '
-         'option for the first time in a campaign')
+    help='monitor all checkpoints (only last by default)')
+inject_simics.add_argument(
+    '--compare_workers',
+    type=int,
+    metavar='WORKERS',
+    default=2,
+    help='number of threads merging and comparing monitored checkpoints '
+         'while the simulation continues with "--compare_all" [default=2]')
+inject_simics.add_argument(
+    '--keep_simics',
+    action='store_true',
+    help='keep Simics running between iterations and reload the next '
+         'checkpoint instead of relaunching Simics for every injection')
+inject_simics.add_argument(
+    '--live',
+    action='store_true',
+    dest='live_injection',
+    help='inject by setting attributes in the running simulation instead of '
+         'writing injected checkpoints (cache targets are always injected '
+         'using checkpoints)')
+inject_simics.add_argument(
+    '--driver',
+    action='store_true',
+    help='perform all injections of an iteration, run the simulation and '
+         'write the monitored checkpoints with a single command to a driver '
+         'script running inside Simics (not supported with cache targets)')
+inject_simics.add_argument(
+    '--snapshots',
+    action='store_true',
+    help='compare intermediate states with the gold checkpoint digests using '
+         'register values and memory hashes read from the running simulation '
+         'instead of writing checkpoints, and inject later faults live '
+         '(not supported with cache targets)')
+inject_simics.add_argument(
+    '--stage',
+    action='store_true',
+    dest='stage_injections',
+    help='write the injected checkpoint for the next iteration in the '
+         'background while the current iteration runs (only for single '
+         'injections without "--live" or "--driver")')
+inject_simics.add_argument(
+    '--converge',
+    action='store_true',
+    help='stop the simulation after the last injection as soon as it matches '
+         'a gold checkpoint and classify the result as masked '
+         '(overrides "--driver")')
+inject_simics.add_argument(
+    '--config_cache',
+    type=int,
+    metavar='MB',
+    default=256,
+    help='memory used to keep the parsed objects of gold checkpoint configs '
+         'between iterations, 0 to disable [default=256]')
+inject_simics.add_argument(
+    '--no_merge',
+    action='store_true',
+    help='compare monitored checkpoints by reading the layers of their '
+         'incremental images instead of merging them (gold checkpoints are '
+         'still merged)')
+inject_simics.add_argument(
+    '--scratch',
+    metavar='DIRECTORY',
+    help='write injected and monitored checkpoints to DIRECTORY (e.g. '
+         '/dev/shm) instead of simics-workspace (not used with "--extract")')
+inject_simics.add_argument(
+    '--scratch_mb',
+    type=int,
+    metavar='MB',
+    default=4096,
+    help='space in the scratch directory shared by all processes, '
+         'checkpoints are written to disk when it is exceeded [default=4096]')
+inject_simics.add_argument(
+    '--full_speed',
+    action='store_true',
+    help='run injected simulations without real-time mode until output or '
+         'log files are transferred from the DUT (ignored with "--log_delay")')
+inject_simics.add_argument(
+    '--watchdog',
+    type=float,
+    metavar='SECONDS',
+    help='sample the program counters of the DUT every SECONDS while waiting '
+         'for its output and classify the DUT as hanging as soon as it stops '
+         'making progress instead of waiting for the timeout')
+inject_simics.add_argument(
+    '--hang_cycles',
+    type=int,
+    metavar='CYCLES',
+    help='simulated cycles without console output or program counter '
+         'progress after which the watchdog declares a hang '
+         '(defaults to the cycles of the gold execution)')
+inject_simics.add_argument(
+    '--memoize',
+    action='store_true',
+    help='reuse the outcome of a previous result of the campaign with the '
+         'same single injection (checkpoint, target, register, index and bit) '
+         'instead of running the simulation (not used with "--live" or '
+         '"--driver")')
 inject_simics.add_argument(
     '-x', '--extract',
     action='store_true',
@@ -148,6 +148,8 @@ class dut(object):
         self.aux = aux
         self.__start_time = None
         self.__timer_value = 0
+        self.reading = False
+        self.read_cancelled = False
         self.ip_address = options.dut_ip_address if not aux \
             else options.aux_ip_address
         self.set_ip = options.dut_set_ip if not aux \
@@ -634,8 +636,20 @@ class dut(object):
         self.serial.write(bytes(string, encoding='utf-8'))
         self.start_timer()
 
-    def read_until(self, string=None, continuous=False, boot=False, flush=True):
+    def cancel_read(self):
+        """
+        Stops a read_until() running in another thread as if the read timed
+        out, which is used by the Simics watchdog after detecting a hang.
+        """
+        if self.reading:
+            self.read_cancelled = True
+            self.serial.cancel_read()
+
+    def read_until(self, string=None, continuous=False, boot=False, flush=True,
+                   deadline=None):
         start_time = perf_counter()
+        if deadline is not None and deadline < self.serial.timeout:
+            self.serial.timeout = deadline
         if string is None:
             if boot and self.options.vxworks:
                 string = '->'
@@ -647,8 +661,12 @@ class dut(object):
         errors = 0
         hanging = False
         returned = False
+        self.reading = True
         while True:
             try:
+                if deadline is not None and \
+                        perf_counter() - start_time > deadline:
+                    raise TimeoutException
                 with timeout(self.options.timeout+5):
                     char = self.serial.read().decode(
                         'utf-8', 'replace').replace('\x00', '')
@@ -667,7 +685,7 @@ class dut(object):
                 self.db.log_event(
                     'Error', 'DUT' if not self.aux else 'AUX', 'Read timeout',
                     self.db.log_trace)
-                if continuous:
+                if continuous and not self.read_cancelled:
                     continue
                 else:
                     break
@@ -739,6 +757,8 @@ class dut(object):
                 break
             # if not boot and buff and buff.endswith('\n'):
             #     self.db.save()
+        self.reading = False
+        self.read_cancelled = False
         self.stop_timer()
         if self.serial.timeout != self.options.timeout:
             try:
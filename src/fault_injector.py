@@ -21,6 +21,7 @@ OF SUCH DAMAGE.
 from datetime import datetime
 from os import listdir, makedirs
 from shutil import rmtree
+from statistics import pstdev
 from threading import Thread
 from time import perf_counter, sleep
 from traceback import print_exc
@@ -97,6 +98,7 @@ class fault_injector(object):
                     success=False, campaign=True)
                 execution_cycles = []
                 execution_times = []
+                wall_times = []
                 for i in range(self.options.iterations):
                     if self.db.campaign.aux and not self.options.aux_readonly:
                         self.debugger.aux.write('{}\n'.format(
@@ -106,6 +108,7 @@ class fault_injector(object):
                         start = self.debugger.get_time()
                     else:
                         self.debugger.dut.reset_timer()
+                    wall_start = perf_counter()
                     self.debugger.dut.write('{}\n'.format(
                         self.db.campaign.command))
                     if self.db.campaign.simics:
@@ -126,6 +129,7 @@ class fault_injector(object):
                             self.debugger.aux.read_until()
                     else:
                         self.debugger.dut.read_until()
+                    wall_times.append(perf_counter() - wall_start)
                     if self.db.campaign.simics:
                         self.debugger.halt_dut()
                         end = self.debugger.get_time()
@@ -161,6 +165,10 @@ class fault_injector(object):
                         int(sum(execution_cycles) / len(execution_cycles))
                 self.db.campaign.execution_time = \
                     sum(execution_times) / len(execution_times)
+                self.db.campaign.execution_time_stddev = \
+                    pstdev(execution_times)
+                self.db.campaign.execution_time_max = max(execution_times)
+                self.db.campaign.wall_time_max = max(wall_times)
                 event.success = True
                 event.timestamp = datetime.now()
                 event.save()
@@ -212,7 +220,8 @@ class fault_injector(object):
                               latent_iteration=0):
             if self.db.campaign.aux and not self.options.aux_readonly:
                 try:
-                    self.debugger.aux.read_until()
+                    self.debugger.aux.read_until(
+                        deadline=self.db.result.timeout)
                 except DrSEUsError as error:
                     self.debugger.dut.write('\x03')
                     self.db.result.outcome_category = 'AUX execution error'
@@ -222,7 +231,8 @@ class fault_injector(object):
                         self.debugger.dut.write('\x03')
             if self.db.campaign.command:
                 try:
-                    self.db.result.returned = self.debugger.dut.read_until()[1]
+                    self.db.result.returned = self.debugger.dut.read_until(
+                        deadline=self.db.result.timeout)[1]
                 except DrSEUsError as error:
                     self.db.result.outcome_category = 'Execution error'
                     self.db.result.outcome = error.type
@@ -255,6 +265,16 @@ class fault_injector(object):
                         else:
                             self.db.result.execution_time = \
                                 self.debugger.dut.get_timer_value()
+            if self.db.campaign.simics and (
+                    self.db.campaign.output_file or
+                    self.db.campaign.log_files or
+                    self.db.campaign.aux_log_files):
+                try:
+                    self.debugger.real_time_mode()
+                except DrSEUsError as error:
+                    self.db.result.outcome_category = 'Simics error'
+                    self.db.result.outcome = error.type
+                    return
             if self.db.campaign.output_file and \
                     self.db.result.outcome == 'In progress':
                 if hasattr(self.debugger, 'aux') and \
@@ -326,6 +346,12 @@ class fault_injector(object):
                         else:
                             break
                 self.db.result.num_injections = self.options.injections
+                if self.options.adaptive_timeout and \
+                        self.db.campaign.wall_time_max:
+                    self.db.result.timeout = (
+                        self.options.adaptive_timeout *
+                        self.db.campaign.wall_time_max +
+                        self.options.timeout_margin)
                 if not self.db.campaign.simics:
                     if self.options.command == 'inject':
                         try:
@@ -377,26 +403,30 @@ class fault_injector(object):
                         except DrSEUsError:
                             pass
                 else:
-                    if not self.db.campaign.command:
-                        sleep_time = (self.db.campaign.execution_time -
-                                      (perf_counter()-start))
-                        if sleep_time > 0:
-                            sleep(sleep_time)
-                    monitor_execution(persistent_faults, True)
+                    # the outcome is already known if the simulation was
+                    # stopped after converging with a gold checkpoint or
+                    # reused from a memoized result
+                    monitored = self.db.result.outcome == 'In progress'
+                    if monitored:
+                        if not self.db.campaign.command:
+                            sleep_time = (self.db.campaign.execution_time -
+                                          (perf_counter()-start))
+                            if sleep_time > 0:
+                                sleep(sleep_time)
+                        monitor_execution(persistent_faults, True)
                     incomplete = False
                     if self.options.log_delay is not None:
                         log_thread.join()
-                    check_latent_faults()
+                    if monitored:
+                        check_latent_faults()
                 if self.db.campaign.simics:
                     try:
-                        self.debugger.close()
+                        self.debugger.close(keep_alive=True)
                     except DrSEUsError as error:
                         self.db.result.outcome_category = 'Simics error'
                         self.db.result.outcome = str(error)
                     finally:
-                        rmtree('simics-workspace/injected-checkpoints/{}/{}'
-                               ''.format(self.db.campaign.id,
-                                         self.db.result.id))
+                        self.debugger.remove_injected_checkpoints()
                 else:
                     try:
                         self.debugger.dut.flush(check_errors=True)
@@ -315,6 +315,11 @@ class result(FilterSet):
     injection__tlb_entry = MultipleChoiceFilter(
         label='TLB entry',
         widget=SelectMultiple(attrs={'class': 'form-control'}), help_text='')
+    memoized = BooleanFilter(
+        field_name='memoized_from', label='Memoized', lookup_expr='isnull',
+        exclude=True,
+        widget=Select(choices=(('3', 'Unknown'), ('1', 'True'), ('0', 'False')),
+                      attrs={'class': 'form-control'}), help_text='')
     num_injections = MultipleChoiceFilter(
         label='Injection quantity',
         widget=SelectMultiple(attrs={'class': 'form-control'}), help_text='')
@@ -338,9 +343,9 @@ class result(FilterSet):
     class Meta:
         model = models.result
         exclude = ('aux_serial_port', 'campaign', 'cycles', 'data_diff',
-                   'detected_errors', 'execution_time', 'num_memory_diffs',
-                   'num_register_diffs', 'previous_result', 'returned',
-                   'timestamp')
+                   'detected_errors', 'execution_time', 'memoized_from',
+                   'num_memory_diffs', 'num_register_diffs', 'previous_result',
+                   'returned', 'timeout', 'timestamp')
 
 
 class simics_register_diff(FilterSet):
@@ -40,6 +40,8 @@ class campaign(Model):
     description = TextField(null=True)
     dut_output = TextField(default=str)
     execution_time = FloatField(null=True)
+    execution_time_max = FloatField(null=True)
+    execution_time_stddev = FloatField(null=True)
     kill_dut = BooleanField(default=False)
     kill_aux = BooleanField(default=False)
     log_files = ArrayField(TextField(), default=list)
@@ -50,6 +52,7 @@ class campaign(Model):
     start_cycle = BigIntegerField(null=True)
     start_time = FloatField(null=True)
     timestamp = DateTimeField(auto_now_add=True)
+    wall_time_max = FloatField(null=True)
 
 
 class result(Model):
@@ -66,6 +69,9 @@ class result(Model):
     dut_output = TextField(default=str)
     dut_serial_port = TextField(null=True)
     execution_time = FloatField(null=True)
+    memoized_from = ForeignKey('self', null=True,
+                               related_name='memoized_results',
+                               on_delete=SET_NULL)
     num_injections = IntegerField(null=True)
     num_register_diffs = IntegerField(null=True)
     num_memory_diffs = IntegerField(null=True)
@@ -74,6 +80,7 @@ class result(Model):
     previous_result = OneToOneField('self', null=True,
                                     related_name='next_result',
                                     on_delete=SET_NULL)
+    timeout = FloatField(null=True)
     timestamp = DateTimeField(auto_now_add=True)
 
 
@@ -47,6 +47,12 @@ class campaigns(Table):
     def render_execution_time(self, record):
         return '{0:.4f}'.format(record.execution_time)
 
+    def render_execution_time_max(self, record):
+        return '{0:.4f}'.format(record.execution_time_max)
+
+    def render_execution_time_stddev(self, record):
+        return '{0:.4f}'.format(record.execution_time_stddev)
+
     def render_results(self, record):
         return '{:,}'.format(
             record.result_set.count())
@@ -78,6 +84,12 @@ class campaign(Table):
     def render_execution_time(self, record):
         return '{0:.4f}'.format(record.execution_time)
 
+    def render_execution_time_max(self, record):
+        return '{0:.4f}'.format(record.execution_time_max)
+
+    def render_execution_time_stddev(self, record):
+        return '{0:.4f}'.format(record.execution_time_stddev)
+
     def render_results(self, record):
         return '{:,}'.format(
             record.result_set.count())
@@ -85,8 +97,9 @@ class campaign(Table):
     class Meta:
         fields = ('id', 'timestamp', 'results', 'command', 'aux_command',
                   'description', 'architecture', 'simics', 'caches', 'aux',
-                  'execution_time', 'cycles', 'output_file', 'checkpoints',
-                  'cycles_between')
+                  'execution_time', 'execution_time_stddev',
+                  'execution_time_max', 'wall_time_max', 'cycles',
+                  'output_file', 'checkpoints', 'cycles_between')
         model = models.campaign
         orderable = False
         template = 'django_tables2/bootstrap.html'
@@ -99,6 +112,10 @@ class results(Table):
     select_box = CheckBoxColumn(
         accessor='id',
         attrs={'th__input': {'onclick': 'update_selection(this)'}})
+    memoized_from = TemplateColumn(
+        '{% if value %}<a href="/result/{{ value }}">{{ value }}</a>'
+        '{% else %}-{% endif %}', accessor='memoized_from_id',
+        verbose_name='Memoized From')
     timestamp = DateTimeColumn(format=datetime_format)
     targets = Column(empty_values=(), orderable=False)
 
@@ -144,7 +161,8 @@ class results(Table):
     class Meta:
         fields = ('select_box', 'id_', 'dut_dev_serial', 'dut_serial_port',
                   'timestamp', 'outcome_category', 'outcome', 'execution_time',
-                  'cycles', 'data_diff', 'data_hash', 'targets', 'registers')
+                  'cycles', 'data_diff', 'data_hash', 'targets', 'registers',
+                  'memoized_from')
         model = models.result
         order_by = '-id_'
         template = 'django_tables2/bootstrap.html'
@@ -154,7 +172,8 @@ class all_results(results):
     class Meta:
         fields = ('select_box', 'id_', 'campaign_id', 'dut_serial_port',
                   'timestamp', 'outcome_category', 'outcome', 'execution_time',
-                  'cycles', 'data_diff', 'targets', 'registers')
+                  'cycles', 'data_diff', 'targets', 'registers',
+                  'memoized_from')
         model = models.result
         order_by = '-id_'
         template = 'django_tables2/bootstrap.html'
@@ -173,6 +192,10 @@ class result(Table):
     previous_result = TemplateColumn(
         '{% if value %}<a href="/result/{{ value }}">{{ value }}</a>'
         '{% else %}None{% endif %}', accessor='previous_result_id')
+    memoized_from = TemplateColumn(
+        '{% if value %}<a href="/result/{{ value }}">{{ value }}</a>'
+        '{% else %}None{% endif %}', accessor='memoized_from_id',
+        verbose_name='Memoized From')
 
     def render_cycles(self, record):
         return '{:,}'.format(record.cycles)
@@ -189,7 +212,7 @@ class result(Table):
         fields = ('dut_dev_serial', 'dut_serial_port', 'timestamp',
                   'outcome_category', 'outcome', 'execution_time', 'cycles',
                   'num_injections', 'data_diff', 'data_hash', 'detected_errors',
-                  'previous_result', 'next_result')
+                  'timeout', 'previous_result', 'next_result', 'memoized_from')
         model = models.result
         orderable = False
         template = 'django_tables2/bootstrap.html'
@@ -18,27 +18,50 @@ OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
 OF SUCH DAMAGE.
 """
 
+from codecs import getincrementaldecoder
 from datetime import datetime
-from os import getcwd, kill, listdir, makedirs, mkdir
-from os.path import exists, join
+from io import IncrementalNewlineDecoder
+from json import dumps, loads
+from math import ceil
+from multiprocessing.pool import ThreadPool
+from os import (getcwd, getpid, kill, makedirs, read, readlink, remove, rename,
+                symlink)
+from os.path import abspath, dirname, exists, islink, join, relpath
 from random import choice
-from re import findall
-from shutil import copyfile
+from re import findall, sub
+from select import select
+from shutil import move, rmtree
 from signal import SIGINT, SIGKILL
-from subprocess import call, check_call, check_output, DEVNULL, PIPE, Popen
+from subprocess import (call, check_call, check_output, DEVNULL, PIPE, Popen,
+                        STDOUT)
 from sys import stdout
+from django.db import connection
 from termcolor import colored
-from threading import Thread
+from threading import Event, Thread
 from time import sleep
+from traceback import format_exc
 
 from ..dut import dut
 from ..error import DrSEUsError
+from ..log.models import injection as injection_model
 from ..targets import choose_injection, get_num_bits, get_targets
 from ..timeout import timeout, TimeoutException
-from .config import data_list, simics_config
+from .checkpoint import (available_space, checkpoint_lock, copy_checkpoint,
+                         directory_size, image_layers)
+from .config import (data_bytes, data_list, data_types, gold_config_cache,
+                     simics_config)
+from .craff import craff_image, diff_images, extract_blocks
+from .digest import (changed_blocks, get_digest_file, get_hashes_file,
+                     hash_image, read_digest, write_digest, write_hashes)
 
 
 class simics(object):
+    read_size = 65536
+    prompt = 'simics> '
+    driver_result = 'DrSEUs-result:'
+    driver_errors = {'inject': 'Error injecting fault',
+                     'run': 'Error continuing simulation'}
+    watchdog_range = 0x1000
     error_messages = ['Address not mapped', 'Illegal Instruction',
                       'Illegal instruction', 'Illegal memory mapping',
                       'Illegal Memory Mapping', 'Error setting attribute',
@@ -50,8 +73,24 @@ class simics(object):
         self.dut = None
         self.aux = None
         self.running = False
+        self.real_time = True
+        self.block_sizes = {}
+        self.staging_thread = None
+        self.staged_injection = None
+        self.staging_error = None
+        self.cleanup_threads = []
+        self.scratch_full = False
+        self.scratch_peak = 0
+        self.watchdog_thread = None
+        self.watchdog_stop = Event()
+        # Simics output and the event to log from the watchdog thread, which
+        # are only logged by the main thread once the watchdog has stopped
+        self.watchdog_output = ''
+        self.watchdog_event = None
         self.db = database
         self.options = options
+        if hasattr(self.options, 'config_cache'):
+            gold_config_cache.budget = self.options.config_cache*2**20
         if self.db.campaign.architecture == 'p2020':
             self.board = 'p2020rdb'
         elif self.db.campaign.architecture == 'a9':
@@ -72,8 +111,13 @@ class simics(object):
             selected_registers = None
         self.targets = get_targets(architecture, 'simics', selected_targets,
                                    selected_registers, self.db.campaign.caches)
+        # cache contents cannot be set through attributes, so these targets
+        # are always injected by modifying a checkpoint
+        self.live_injection = not any(
+            'type' in target and target['type'] == 'gcache'
+            for target in self.targets.values())
 
-    def launch_simics(self, checkpoint=None):
+    def __start_simics(self):
         cwd = '{}/simics-workspace'.format(getcwd())
         attempts = 10
         for attempt in range(attempts):
@@ -82,6 +126,11 @@ class simics(object):
                  '-stall' if self.db.campaign.caches else ''],
                 bufsize=0, cwd=cwd, universal_newlines=True,
                 stdin=PIPE, stdout=PIPE, stderr=PIPE)
+            # stdout is read directly from the pipe, so decode it here instead
+            self.stdout_decoder = IncrementalNewlineDecoder(
+                getincrementaldecoder('utf-8')('replace'), translate=True)
+            # output read past the last prompt, which starts the next read
+            self.stdout_buffer = ''
             try:
                 self.__command()
             except KeyboardInterrupt:
@@ -100,6 +149,35 @@ class simics(object):
                 self.__command('disable-multithreading')
                 self.__command('dstc-disable')
                 self.__command('istc-disable')
+        self.__command('run-python-file {}/driver.py'.format(
+            dirname(abspath(__file__))))
+        # remember the objects that exist before any configuration is loaded
+        # so a persistent Simics can be returned to this state
+        self.__command('@drseus_save_core_objects()')
+
+    def __unload_simics(self):
+        """
+        Closes the DUT/AUX connections and deletes every object created by the
+        loaded configuration, leaving Simics running and ready to read the
+        next configuration.
+        """
+        self.__stop_watchdog()
+        event = self.db.log_event('Information', 'Simics',
+                                  'Unloaded configuration', success=False)
+        if self.dut:
+            self.dut.close()
+            self.dut = None
+        if self.aux:
+            self.aux.close()
+            self.aux = None
+        self.halt_dut()
+        self.__command('@drseus_unload()')
+        event.success = True
+        event.save()
+
+    def launch_simics(self, checkpoint=None):
+        if self.simics is None:
+            self.__start_simics()
         if checkpoint is None:
             self.__command('$drseus=TRUE')
             buff = self.__command(
@@ -124,7 +202,14 @@ class simics(object):
                 buff += self.__command('connect-real-network-port-in ssh '
                                        'ethernet_switch0 '
                                        'target-ip=10.10.0.104')
-        self.__command('enable-real-time-mode')
+        # real-time mode is only needed for transferring files over the
+        # simulated network, so it can be enabled later for injections
+        self.real_time = not (hasattr(self.options, 'full_speed') and
+                              self.options.full_speed and
+                              self.options.log_delay is None and
+                              checkpoint is not None)
+        if self.real_time:
+            self.__command('enable-real-time-mode')
         found_settings = 0
         if checkpoint is None:
             serial_ports = []
@@ -256,8 +341,27 @@ class simics(object):
         cwd = '{}/simics-workspace'.format(getcwd())
         call(['{}/simics-gui'.format(cwd), '-e', simics_commands], cwd=cwd)
 
-    def close(self):
+    def close(self, keep_alive=False):
+        if keep_alive and self.simics and self.options.keep_simics:
+            try:
+                self.__unload_simics()
+            except DrSEUsError:
+                self.db.log_event(
+                    'Warning', 'Simics', 'Error unloading configuration',
+                    self.db.log_exception)
+            else:
+                return
+        if not keep_alive:
+            if self.staging_thread is not None:
+                self.staging_thread.join()
+                self.staging_thread = None
+                if exists(self.__get_staged_checkpoint()):
+                    rmtree(self.__get_staged_checkpoint())
+            for thread in self.cleanup_threads:
+                thread.join()
+            self.cleanup_threads = []
         if self.simics:
+            self.__stop_watchdog()
             event = self.db.log_event('Information', 'Simics', 'Closed Simics',
                                       success=False)
             if self.dut:
@@ -313,6 +417,7 @@ class simics(object):
                               'Simics already closed', success=False)
 
     def halt_dut(self):
+        self.__stop_watchdog()
         if self.running:
             event = self.db.log_event('Information', 'Simics', 'Halt DUT',
                                       success=False)
@@ -336,65 +441,197 @@ class simics(object):
             if self.options.debug:
                 print(colored('run', 'yellow'))
             self.db.log_event('Warning', 'Simics', 'Continue DUT', success=True)
+            if self.db.result is not None and self.options.watchdog and \
+                    self.db.result.outcome == 'In progress' and \
+                    self.db.result.returned is None:
+                self.__start_watchdog()
         else:
             self.db.log_event('Warning', 'Simics', 'Continue DUT',
                               'Simulation already running', success=False)
 
+    def __start_watchdog(self):
+        self.watchdog_stop.clear()
+        self.watchdog_output = ''
+        self.watchdog_event = None
+        self.watchdog_thread = Thread(target=self.__watchdog)
+        self.watchdog_thread.start()
+
+    def __stop_watchdog(self):
+        if self.watchdog_thread is not None:
+            self.watchdog_stop.set()
+            self.watchdog_thread.join()
+            self.watchdog_thread = None
+            if self.watchdog_output:
+                self.db.result.debugger_output += self.watchdog_output
+                self.db.save()
+                self.watchdog_output = ''
+            if self.watchdog_event is not None:
+                self.db.log_event(*self.watchdog_event)
+                self.watchdog_event = None
+
+    def __sample_progress(self):
+        """
+        Pauses the simulation to read the cycle count and the program counter
+        of every processor and continues it again.
+        """
+        try:
+            self.simics.send_signal(SIGINT)
+            self.__command(watchdog=True)
+            try:
+                return self.__run_driver([['progress']], watchdog=True)[0]
+            finally:
+                self.simics.stdin.write('run\n')
+                self.watchdog_output += 'run\n'
+        except DrSEUsError:
+            self.watchdog_event = ('Warning', 'Simics', 'Watchdog error',
+                                   format_exc())
+
+    def __watchdog(self):
+        """
+        Samples the progress of the running simulation every options.watchdog
+        seconds and stops reading from the DUT as soon as it hangs. The DUT
+        makes progress while it prints to its console or while any processor
+        leaves the code surrounding its program counter from the start of the
+        current window (e.g. a panic or idle loop). It hangs once it does not
+        make progress for options.hang_cycles (defaults to the length of the
+        gold execution) or for one sample after printing a kernel error.
+        Nothing is logged to the database from this thread, the hang or error
+        is logged by __stop_watchdog() instead.
+        """
+
+        def detect_hang():
+            hang_cycles = self.options.hang_cycles or self.db.campaign.cycles
+            kernel_errors = [message for message, category
+                             in self.dut.error_messages
+                             if category == 'Kernel error']
+            window = None
+            panicked = False
+            while not self.watchdog_stop.wait(self.options.watchdog):
+                progress = self.__sample_progress()
+                if progress is None:
+                    return
+                cycles, program_counters = progress
+                output = self.db.result.dut_output
+                if window is None or len(output) != window[1] or any(
+                        abs(program_counter-window[2][processor]) >
+                        self.watchdog_range for processor, program_counter
+                        in program_counters.items()):
+                    new_output = output[window[1]:] if window else output
+                    panicked = panicked or any(message in new_output
+                                               for message in kernel_errors)
+                    window = (cycles, len(output), program_counters)
+                elif panicked or cycles-window[0] >= hang_cycles:
+                    self.watchdog_event = (
+                        'Information', 'Simics', 'Hang detected',
+                        '{} cycles without progress{}'.format(
+                            cycles-window[0],
+                            ' after kernel error' if panicked else ''))
+                    self.dut.cancel_read()
+                    if self.aux:
+                        self.aux.cancel_read()
+                    return
+
+    # def __watchdog(self):
+        try:
+            detect_hang()
+        finally:
+            connection.close()
+
     def reset_dut(self):
         pass
 
-    def __command(self, command=None, timeout_=300):
+    def real_time_mode(self):
+        """
+        Enables real-time mode if the simulation was launched at full speed,
+        which is required before communicating with the DUT over the network.
+        """
+        if not self.real_time:
+            running = self.running
+            if running:
+                self.halt_dut()
+            self.__command('enable-real-time-mode')
+            self.real_time = True
+            if running:
+                self.continue_dut()
+
+    def __command(self, command=None, timeout_=300, watchdog=False):
 
         def read_until():
-            buff = ''
+            """
+            Reads whatever output is available from Simics until the prompt is
+            found, or until no output has been received for timeout_ seconds.
+            Output after the prompt is kept for the next read.
+            """
+            buff = self.stdout_buffer
+            self.stdout_buffer = ''
+            searched = 0
             hanging = False
+            stdout_fd = self.simics.stdout.fileno()
             while True:
-                try:
-                    with timeout(timeout_):
-                        char = self.simics.stdout.read(1)
-                except TimeoutException:
-                    char = ''
+                prompt = buff.find(self.prompt, searched)
+                if prompt >= 0:
+                    prompt += len(self.prompt)
+                    buff, self.stdout_buffer = buff[:prompt], buff[prompt:]
+                    break
+                searched = max(len(buff)-len(self.prompt)+1, 0)
+                if not select([stdout_fd], [], [], timeout_)[0]:
                     hanging = True
-                    self.db.log_event(
-                        'Error', 'Simics', 'Read timeout',
-                        self.db.log_exception)
-                if not char:
+                    if not watchdog:
+                        self.db.log_event('Error', 'Simics', 'Read timeout',
+                                          self.db.log_trace)
                     break
-                if self.db.result is None:
-                    self.db.campaign.debugger_output += char
-                else:
-                    self.db.result.debugger_output += char
+                data = read(stdout_fd, self.read_size)
+                if not data:
+                    break
+                chunk = self.stdout_decoder.decode(data)
+                if not chunk:
+                    continue
                 if self.options.debug:
-                    print(colored(char, 'yellow'), end='')
+                    print(colored(chunk, 'yellow'), end='')
                     stdout.flush()
-                buff += char
-                if buff.endswith('simics> '):
-                    break
+                buff += chunk
             if self.options.debug:
                 print()
-            self.db.save()
+            # results from the driver are only parsed, not logged, and may
+            # contain register names such as "error_status", so they are not
+            # checked for error messages
+            messages = sub(r'{}.*\n?'.format(self.driver_result), '', buff)
+            if watchdog:
+                self.watchdog_output += messages
+            else:
+                if self.db.result is None:
+                    self.db.campaign.debugger_output += messages
+                else:
+                    self.db.result.debugger_output += messages
+                self.db.save()
             for message in self.error_messages:
-                if message in buff and 'sn_port_forward_in error' not in buff:
-                    self.db.log_event('Error', 'Simics', message, buff)
+                if message in messages and \
+                        'sn_port_forward_in error' not in messages:
+                    if not watchdog:
+                        self.db.log_event('Error', 'Simics', message, buff)
                     raise DrSEUsError(message)
             if hanging:
                 raise DrSEUsError('Timeout reading from Simics')
             return buff
 
-    # def __command(self, command=None, timeout_=300):
-        if command:
+    # def __command(self, command=None, timeout_=300, watchdog=False):
+        # commands of the watchdog thread are not logged to the database, their
+        # output is kept in watchdog_output instead
+        if command and not watchdog:
             event = self.db.log_event(
                 'Information', 'Simics', 'Command', command, success=False)
         if command is not None:
             self.simics.stdin.write('{}\n'.format(command))
-            if self.db.result is None:
+            if watchdog:
+                self.watchdog_output += '{}\n'.format(command)
+            elif self.db.result is None:
                 self.db.campaign.debugger_output += '{}\n'.format(command)
             else:
                 self.db.result.debugger_output += '{}\n'.format(command)
             if self.options.debug:
                 print(colored(command, 'yellow'))
         buff = read_until()
-        if command:
+        if command and not watchdog:
             event.success = True
             event.save()
         return buff
@@ -414,11 +651,13 @@ class simics(object):
         else:
             raise DrSEUsError(error_type)
 
-    def __merge_checkpoint(self, checkpoint, attempts=10):
+    def __merge_checkpoint(self, checkpoint, attempts=10,
+                           merged_checkpoint=None):
         if self.options.debug:
             print(colored('merging checkpoint...', 'blue'), end='')
             stdout.flush()
-        merged_checkpoint = '{}_merged'.format(checkpoint)
+        if merged_checkpoint is None:
+            merged_checkpoint = '{}_merged'.format(checkpoint)
         cwd = '{}/simics-workspace'.format(getcwd())
         for attempt in range(attempts):
             try:
@@ -465,32 +704,53 @@ class simics(object):
             read_thread = Thread(target=self.dut.read_until,
                                  kwargs={'flush': False})
             read_thread.start()
+            # with multiple workers, only every spacing checkpoints are written
+            # here and the rest are created by a worker for each gap, which is
+            # started as soon as the checkpoint that ends the gap is written
+            if self.options.gold_workers and self.options.gold_workers > 1:
+                spacing = max(1, ceil(self.options.checkpoints /
+                                      self.options.gold_workers))
+            else:
+                spacing = 1
+            workers = []
             checkpoint = 1
-            while True:
-                self.__command('run-cycles {}'.format(
-                    self.db.campaign.cycles_between), timeout_=300)
-                old_length = length
-                length = len(self.db.campaign.dut_output)
-                if length - old_length:
-                    self.db.campaign.dut_output += \
-                        '{}{:*^80}\n\n'.format(
-                            '\n'
-                            if self.db.campaign.dut_output.endswith('\n')
-                            else '\n\n',
-                            ' Checkpoint {} '.format(checkpoint))
+            try:
+                while True:
+                    self.__command('run-cycles {}'.format(
+                        self.db.campaign.cycles_between), timeout_=300)
+                    old_length = length
                     length = len(self.db.campaign.dut_output)
-                incremental_checkpoint = 'gold-checkpoints/{}/{}'.format(
-                    self.db.campaign.id, checkpoint)
-                self.__command('write-configuration {}'.format(
-                    incremental_checkpoint), timeout_=300)
-                if not read_thread.is_alive() or \
-                    (self.db.campaign.aux and
-                        self.db.campaign.kill_dut and
-                        not aux_process.is_alive()):
-                    self.__merge_checkpoint(incremental_checkpoint)
-                    break
-                else:
-                    checkpoint += 1
+                    if length - old_length:
+                        self.db.campaign.dut_output += \
+                            '{}{:*^80}\n\n'.format(
+                                '\n'
+                                if self.db.campaign.dut_output.endswith('\n')
+                                else '\n\n',
+                                ' Checkpoint {} '.format(checkpoint))
+                        length = len(self.db.campaign.dut_output)
+                    incremental_checkpoint = 'gold-checkpoints/{}/{}'.format(
+                        self.db.campaign.id, checkpoint)
+                    finished = not read_thread.is_alive() or \
+                        (self.db.campaign.aux and
+                            self.db.campaign.kill_dut and
+                            not aux_process.is_alive())
+                    if finished or (checkpoint-1) % spacing == 0:
+                        self.__command('write-configuration {}'.format(
+                            incremental_checkpoint), timeout_=300)
+                        if spacing > 1 and checkpoint > 1:
+                            workers.append(self.__start_fill_worker(
+                                checkpoint-1-(checkpoint-2) % spacing,
+                                checkpoint))
+                    if finished:
+                        self.__merge_checkpoint(incremental_checkpoint)
+                        break
+                    else:
+                        checkpoint += 1
+            except BaseException:
+                for first_checkpoint, last_checkpoint, worker in workers:
+                    worker.kill()
+                    worker.wait()
+                raise
             self.db.campaign.checkpoints = checkpoint
             event.success = True
             event.timestamp = datetime.now()
@@ -503,12 +763,17 @@ class simics(object):
             if self.db.campaign.kill_dut:
                 self.dut.write('\x03')
             read_thread.join()
+            if workers:
+                self.__fill_checkpoints(workers)
         else:
             self.db.campaign.checkpoints = 1
             self.halt_dut()
             self.__command(
                 'write-configuration gold-checkpoints/{}/1'.format(
                     self.db.campaign.id), timeout_=300)
+        if self.options.merge_gold:
+            self.__merge_gold_checkpoints()
+        self.__create_digests()
 
     def inject_faults(self):
 
@@ -548,12 +813,59 @@ class simics(object):
         checkpoints_to_inject = sorted(checkpoints_to_inject)
         reg_errors = 0
         mem_errors = 0
-        if checkpoints_to_inject:
+        # injecting live also avoids writing checkpoints between injections
+        live = (self.options.live_injection or self.options.snapshots) and \
+            self.live_injection
+        driver = self.options.driver and self.live_injection and \
+            not self.options.converge
+        stage = self.options.stage_injections and \
+            self.options.injections == 1 and not live and not driver
+        staged = None
+        if stage and self.staging_thread is not None:
+            staged = self.__use_staged_injection()
+            if staged is not None:
+                checkpoints_to_inject = [staged[1].checkpoint]
+        if checkpoints_to_inject and driver:
+            reg_errors, mem_errors = \
+                self.__inject_driver(checkpoints_to_inject)
+            self.continue_dut()
+        elif checkpoints_to_inject:
             for injection_number, checkpoint in \
                     enumerate(checkpoints_to_inject, start=1):
-                injected_checkpoint, injection = \
-                    self.__inject_checkpoint(injection_number, checkpoint)
-                self.launch_simics(injected_checkpoint)
+                if live:
+                    if injection_number == 1:
+                        self.__make_injected_checkpoints()
+                        self.launch_simics('gold-checkpoints/{}/{}'.format(
+                            self.db.campaign.id, checkpoint))
+                    injection = self.__inject_live(checkpoint)
+                else:
+                    memoize = self.options.memoize and \
+                        len(checkpoints_to_inject) == 1
+                    if staged is not None:
+                        injected_checkpoint, injection = staged
+                    elif memoize:
+                        # the chosen injection is looked up before its
+                        # checkpoint is built, which is only needed if it has
+                        # not been simulated before
+                        injection = self.__create_injection(checkpoint)
+                    else:
+                        injected_checkpoint, injection = \
+                            self.__inject_checkpoint(injection_number,
+                                                     checkpoint)
+                    if memoize:
+                        memoized = self.__use_memoized_result(injection)
+                        if memoized is not None:
+                            if stage:
+                                self.__start_staging()
+                            return memoized
+                        if staged is None:
+                            injected_checkpoint, injection = \
+                                self.__inject_checkpoint(
+                                    injection_number, checkpoint,
+                                    chosen=injection)
+                    self.launch_simics(injected_checkpoint)
+                    if stage:
+                        self.__start_staging()
                 injection.time = self.get_time()[1]-self.db.campaign.start_time
                 injection.save()
                 injections_remaining = \
@@ -562,26 +874,71 @@ class simics(object):
                     next_checkpoint = checkpoints_to_inject[injection_number]
                 else:
                     next_checkpoint = self.db.campaign.checkpoints
-                reg_errors_, mem_errors_ = \
-                    self.__compare_checkpoints(checkpoint, next_checkpoint)
+                reg_errors_, mem_errors_ = self.__compare_checkpoints(
+                    checkpoint, next_checkpoint,
+                    write_last=not (live and injections_remaining))
                 if reg_errors_ > reg_errors:
                     reg_errors = reg_errors_
                 if mem_errors_ > mem_errors:
                     mem_errors = mem_errors_
                 if injections_remaining:
-                    self.close()
+                    if not live:
+                        self.close(keep_alive=True)
                 else:
                     self.continue_dut()
         else:
-            self.close()
-            makedirs('simics-workspace/injected-checkpoints/{}/{}'.format(
-                self.db.campaign.id, self.db.result.id))
+            self.close(keep_alive=True)
+            self.__make_injected_checkpoints()
             self.launch_simics('gold-checkpoints/{}/1'.format(
                 self.db.campaign.id))
             reg_errors, mem_errors = \
                 self.__compare_checkpoints(1, self.db.campaign.checkpoints)
         return reg_errors, mem_errors, (reg_errors and persistent_faults())
 
+    def __get_memoized_result(self, injection):
+        """
+        Returns the earliest completed result of the campaign with the same
+        single injection, which is deterministic in Simics.
+        """
+        return self.db.campaign.result_set.filter(
+            num_injections=1, memoized_from__isnull=True,
+            injection__checkpoint=injection.checkpoint,
+            injection__config_object=injection.config_object,
+            injection__register=injection.register,
+            injection__register_index=injection.register_index,
+            injection__field=injection.field,
+            injection__bit=injection.bit,
+            injection__tlb_entry=injection.tlb_entry,
+            injection__success=True
+        ).exclude(
+            id=self.db.result.id
+        ).exclude(
+            outcome_category__in=['Incomplete', 'DrSEUs', 'Simics error',
+                                  'Supervisor']
+        ).order_by('id').first()
+
+    def __use_memoized_result(self, injection):
+        memoized = self.__get_memoized_result(injection)
+        if memoized is None:
+            return None
+        if not injection.success:
+            # the injection was not performed, so its values are those of the
+            # memoized injection
+            memoized_injection = memoized.injection_set.get()
+            injection.gold_value = memoized_injection.gold_value
+            injection.injected_value = memoized_injection.injected_value
+            self.__log_injection(injection)
+        for attribute in ('outcome_category', 'outcome', 'cycles',
+                          'execution_time', 'data_diff', 'data_hash',
+                          'detected_errors', 'returned'):
+            setattr(self.db.result, attribute, getattr(memoized, attribute))
+        self.db.result.memoized_from = memoized
+        self.db.log_event(
+            'Information', 'Simics', 'Memoized result',
+            'Reused outcome of result {}'.format(memoized.id))
+        return (memoized.num_register_diffs or 0,
+                memoized.num_memory_diffs or 0, False)
+
     def regenerate_checkpoints(self, injections):
         self.db.result.id = self.options.result_id
         for injection_number, injection in enumerate(injections, start=1):
@@ -600,88 +957,516 @@ class simics(object):
                 self.close()
         return injected_checkpoint
 
-    def __inject_checkpoint(self, injection_number, checkpoint, injection=None):
-
-        def inject_config(injected_checkpoint, injection):
-
-            def flip_bit(value, bit):
-                num_bits = get_num_bits(
-                    injection.field, injection.register, injection.target,
-                    self.targets)
-                if bit >= num_bits or bit < 0:
-                    raise Exception('invalid bit: {} for num_bits: {}'.format(
-                        bit, num_bits))
-                value = int(value, base=0)
-                binary_list = list(bin(value)[2:].zfill(num_bits))
-                binary_list[num_bits-1-bit] = (
-                    '1' if binary_list[num_bits-1-bit] == '0' else '0')
-                injected_value = int(''.join(binary_list), 2)
-                injected_value = hex(injected_value).rstrip('L')
-                return injected_value
-
-        # def inject_config(injected_checkpoint, injection):
-            with simics_config(injected_checkpoint) as config:
-                config_object = injection.config_object
-                if injection.register_alias is None:
-                    register = injection.register
+    def __choose_injection(self, checkpoint):
+        """
+        Returns a new injection which is not saved to the database yet.
+        """
+        injection = choose_injection(self.targets,
+                                     self.options.selected_target_indices)
+        injection = injection_model(
+            checkpoint=checkpoint, success=False, **injection)
+        target = self.targets[injection.target]
+        if 'type' in target and target['type'] == 'gcache':
+            injection.config_object = \
+                self.targets[injection.target]['object']
+        else:
+            injection.config_object = 'DUT_{}.{}'.format(
+                self.board, self.targets[injection.target]['object'])
+        if injection.target_index is not None:
+            injection.config_object += '[{}]'.format(injection.target_index)
+        return injection
+
+    def __create_injection(self, checkpoint):
+        injection = self.__choose_injection(checkpoint)
+        injection.result = self.db.result
+        injection.save()
+        return injection
+
+    def __get_staged_checkpoint(self):
+        if self.__get_scratch() is not None:
+            return join(self.__get_scratch(), str(self.db.campaign.id),
+                        'staged-{}'.format(getpid()))
+        return 'simics-workspace/injected-checkpoints/{}/staged-{}'.format(
+            self.db.campaign.id, getpid())
+
+    def __get_scratch(self):
+        """
+        Returns the directory for injected checkpoints in options.scratch, or
+        None if they are written to disk. Extracted memory blocks are kept
+        with the checkpoints, so these are always written to disk.
+        """
+        if hasattr(self.options, 'scratch') and self.options.scratch and \
+                not self.options.extract_blocks:
+            return join(self.options.scratch, 'drseus')
+
+    def __make_injected_checkpoints(self):
+        """
+        Creates the directory for the checkpoints of the current result. It is
+        a link to a directory in options.scratch (e.g. a tmpfs) unless that
+        would exceed the share of options.scratch_mb of this process (one of
+        options.processes), in which case it is created on disk instead.
+        """
+        injected_checkpoints = \
+            'simics-workspace/injected-checkpoints/{}/{}'.format(
+                self.db.campaign.id, self.db.result.id)
+        if exists(injected_checkpoints):
+            return
+        scratch = self.__get_scratch()
+        if scratch is not None and not self.scratch_full:
+            budget = self.options.scratch_mb * 2**20 / self.options.processes
+            makedirs(scratch, exist_ok=True)
+            if self.scratch_peak > budget or available_space(scratch) < budget:
+                self.scratch_full = True
+                self.db.log_event(
+                    'Warning', 'Simics', 'Scratch space exceeded',
+                    'writing injected checkpoints to disk (used {:.1f} of {} '
+                    'MB)'.format(self.scratch_peak / 2**20, budget / 2**20))
+            else:
+                scratch_checkpoints = join(scratch, str(self.db.campaign.id),
+                                           str(self.db.result.id))
+                makedirs(scratch_checkpoints)
+                makedirs(dirname(injected_checkpoints), exist_ok=True)
+                symlink(abspath(scratch_checkpoints), injected_checkpoints)
+                return
+        makedirs(injected_checkpoints)
+
+    def __remove_checkpoints(self, injected_checkpoints):
+        if islink(injected_checkpoints):
+            scratch_checkpoints = readlink(injected_checkpoints)
+            remove(injected_checkpoints)
+            self.scratch_peak = max(self.scratch_peak,
+                                    directory_size(scratch_checkpoints))
+            rmtree(scratch_checkpoints, ignore_errors=True)
+        else:
+            rmtree(injected_checkpoints, ignore_errors=True)
+
+    def __stage_injection(self):
+        """
+        Chooses the injection for the next iteration and writes its injected
+        checkpoint to a staging directory. This runs in a background thread
+        while the current iteration is simulated, so the database is not used
+        until the staged injection is used by __use_staged_injection().
+        """
+        try:
+            checkpoint = choice(range(1, self.db.campaign.checkpoints))
+            injection = self.__choose_injection(checkpoint)
+            staged_checkpoint = self.__get_staged_checkpoint()
+            if exists(staged_checkpoint):
+                rmtree(staged_checkpoint)
+            makedirs(staged_checkpoint)
+            gold_checkpoint = 'simics-workspace/gold-checkpoints/{}/{}'.format(
+                self.db.campaign.id, checkpoint)
+            copy_checkpoint(gold_checkpoint, staged_checkpoint)
+            injection.gold_value, injection.injected_value = \
+                self.__inject_config(staged_checkpoint, injection,
+                                     gold_checkpoint)
+        except Exception:
+            self.staging_error = format_exc()
+        else:
+            self.staged_injection = staged_checkpoint, injection
+
+    def __start_staging(self):
+        self.staged_injection = None
+        self.staging_error = None
+        self.staging_thread = Thread(target=self.__stage_injection)
+        self.staging_thread.start()
+
+    def __use_staged_injection(self):
+        """
+        Waits for the injection staged in the background and moves its
+        injected checkpoint to the current result. Returns None if staging
+        failed, in which case the injection is performed normally.
+        """
+        self.staging_thread.join()
+        self.staging_thread = None
+        if self.staged_injection is None:
+            self.db.log_event(
+                'Warning', 'Simics', 'Error staging injection',
+                self.staging_error)
+            return None
+        staged_checkpoint, injection = self.staged_injection
+        self.staged_injection = None
+        injected_checkpoint = \
+            'simics-workspace/injected-checkpoints/{}/{}/{}_injected'.format(
+                self.db.campaign.id, self.db.result.id, injection.checkpoint)
+        self.__make_injected_checkpoints()
+        # the staged checkpoint is copied if the result is not in the scratch
+        # directory, which is cheap because its images are links in that case
+        move(staged_checkpoint, injected_checkpoint)
+        injection.result = self.db.result
+        injection.save()
+        self.__log_injection(injection)
+        return injected_checkpoint.replace('simics-workspace/', ''), injection
+
+    def remove_injected_checkpoints(self):
+        """
+        Removes the injected checkpoints of the current result in a background
+        thread, the next iteration does not need to wait for it.
+        """
+        injected_checkpoints = \
+            'simics-workspace/injected-checkpoints/{}/{}'.format(
+                self.db.campaign.id, self.db.result.id)
+        if exists(injected_checkpoints) or islink(injected_checkpoints):
+            cleanup_thread = Thread(target=self.__remove_checkpoints,
+                                    args=(injected_checkpoints,))
+            cleanup_thread.start()
+            self.cleanup_threads = [
+                thread for thread in self.cleanup_threads
+                if thread.is_alive()] + [cleanup_thread]
+
+    def __log_injection(self, injection):
+        injection.success = True
+        injection.save()
+        self.db.log_event(
+            'Information', 'Simics', 'Fault injected')
+        if self.options.debug:
+            print(colored(
+                'result id: {}\ncheckpoint number: {}\ntarget: {}\n'
+                'register: {}\nfield: {}\nbit: {}\ngold value: {}\n'
+                'injected value: {}'.format(
+                    self.db.result.id, injection.checkpoint,
+                    injection.target_name, injection.register, injection.field,
+                    injection.bit, injection.gold_value,
+                    injection.injected_value),
+                'magenta'))
+            if injection.register_index is not None:
+                print(colored('register index: {}'.format(
+                    injection.register_index), 'magenta'))
+
+    def __check_bit(self, injection):
+        num_bits = get_num_bits(
+            injection.field, injection.register, injection.target,
+            self.targets)
+        if injection.bit >= num_bits or injection.bit < 0:
+            raise Exception('invalid bit: {} for num_bits: {}'.format(
+                injection.bit, num_bits))
+        return num_bits
+
+    def __flip_bit(self, injection, value):
+        num_bits = self.__check_bit(injection)
+        value = int(value, base=0)
+        binary_list = list(bin(value)[2:].zfill(num_bits))
+        binary_list[num_bits-1-injection.bit] = (
+            '1' if binary_list[num_bits-1-injection.bit] == '0' else '0')
+        injected_value = int(''.join(binary_list), 2)
+        injected_value = hex(injected_value).rstrip('L')
+        return injected_value
+
+    def __run_driver(self, steps, timeout_=300, watchdog=False):
+        """
+        Performs steps with the driver loaded into Simics (driver.py) using a
+        single command and returns the result of each step. Errors are only
+        logged to the database if not called from the watchdog thread.
+        """
+        buff = self.__command('@drseus_iteration({!r})'.format(dumps(steps)),
+                              timeout_=timeout_, watchdog=watchdog)
+        output = findall(r'{}(.*)'.format(self.driver_result), buff)
+        if not output:
+            if not watchdog:
+                self.db.log_event('Error', 'Simics', 'Driver error', buff)
+            raise DrSEUsError('Simics driver error')
+        output = loads(output[-1])
+        if output['error'] is not None:
+            step, message = output['error']
+            if not watchdog:
+                self.db.log_event('Error', 'Simics', 'Driver error',
+                                  '{}: {}'.format(step, message))
+            raise DrSEUsError(self.driver_errors.get(step,
+                                                     'Simics driver error'))
+        return output['results']
+
+    def __inject_step(self, injection):
+        if injection.register_alias is None:
+            register = injection.register
+        else:
+            register = injection.register_alias
+        return ['inject', injection.config_object, register,
+                injection.register_index, injection.bit]
+
+    def __config_values(self, injection, gold_value, injected_value):
+        """
+        Formats the gold and injected values returned by the driver the same
+        way as __inject_config(), using the text of the register in the gold
+        checkpoint config, so injection rows do not depend on whether the
+        fault was injected in a checkpoint or in the running simulation.
+        """
+        with simics_config('simics-workspace/gold-checkpoints/{}/{}'.format(
+                self.db.campaign.id, injection.checkpoint), lazy=True,
+                cache=gold_config_cache) as config:
+            if injection.register_alias is None:
+                register = injection.register
+            else:
+                register = injection.register_alias
+            text = config.get(injection.config_object, register)
+        if injection.register_index is not None and text is not None:
+            for index in injection.register_index:
+                text = text[index]
+        target = self.targets[injection.target]
+        cache_data = 'type' in target and target['type'] == 'gcache' and \
+            injection.field == 'data'
+        if isinstance(text, data_types):
+            text = '0x'+text[0]
+        elif isinstance(text, str) and text[:1] == '[' and text[-1:] == ']':
+            text = '0x'+text[1:-1]
+        gold_value = int(gold_value, base=0)
+        injected_value = int(injected_value, base=0)
+        if isinstance(text, str) and text.startswith('0x'):
+            gold_value = '0x'+'{:x}'.format(gold_value).zfill(len(text)-2)
+        elif isinstance(text, str) and text.isdigit():
+            gold_value = str(gold_value)
+        else:
+            gold_value = hex(gold_value)
+        if cache_data:
+            bits = int(get_num_bits(
+                injection.field, injection.register,
+                injection.target, self.targets) / 4)  # hex
+            injected_value = '0x'+'{:x}'.format(injected_value).zfill(bits)
+        else:
+            injected_value = hex(injected_value)
+        return gold_value, injected_value
+
+    def __inject_live(self, checkpoint):
+        """
+        Injects a fault into the loaded configuration by setting the target
+        attribute in the running simulation instead of writing an injected
+        checkpoint.
+        """
+        injection = self.__create_injection(checkpoint)
+        try:
+            self.__check_bit(injection)
+            injection.gold_value, injection.injected_value = \
+                self.__config_values(injection, *self.__run_driver(
+                    [self.__inject_step(injection)])[0])
+        except KeyboardInterrupt:
+            raise KeyboardInterrupt
+        except:
+            self.db.log_event(
+                'Error', 'Simics', 'Error injecting fault',
+                self.db.log_exception)
+            raise DrSEUsError('Error injecting fault')
+        self.__log_injection(injection)
+        return injection
+
+    def __inject_driver(self, checkpoints_to_inject):
+        """
+        Performs every injection of the iteration, runs the simulation to the
+        end of the campaign and writes the monitored checkpoints with a single
+        call to the driver, then compares the monitored checkpoints using the
+        register values read by the driver.
+        """
+        self.__make_injected_checkpoints()
+        self.launch_simics('gold-checkpoints/{}/{}'.format(
+            self.db.campaign.id, checkpoints_to_inject[0]))
+        registers = self.__get_register_names()
+        injections = []
+        monitored_checkpoints = []
+        steps = []
+        timeout_ = 0
+        for injection_number, checkpoint in \
+                enumerate(checkpoints_to_inject, start=1):
+            injection = self.__create_injection(checkpoint)
+            try:
+                self.__check_bit(injection)
+            except KeyboardInterrupt:
+                raise KeyboardInterrupt
+            except:
+                self.db.log_event(
+                    'Error', 'Simics', 'Error injecting fault',
+                    self.db.log_exception)
+                raise DrSEUsError('Error injecting fault')
+            injections.append(injection)
+            steps.append(['time'])
+            steps.append(self.__inject_step(injection))
+            if injection_number < len(checkpoints_to_inject):
+                next_checkpoint = checkpoints_to_inject[injection_number]
+            else:
+                next_checkpoint = self.db.campaign.checkpoints
+            if self.options.compare_all:
+                segments = [
+                    (checkpoint_, self.db.campaign.cycles_between)
+                    for checkpoint_ in range(checkpoint+1, next_checkpoint+1)]
+            else:
+                segments = [(next_checkpoint,
+                             self.db.campaign.cycles_between *
+                             (next_checkpoint-checkpoint))]
+            for checkpoint_, cycles in segments:
+                steps.append(['run', cycles])
+                timeout_ += self.__run_timeout(cycles)
+                if self.options.compare_all or \
+                        checkpoint_ == self.db.campaign.checkpoints:
+                    steps.append(
+                        ['write', 'injected-checkpoints/{}/{}/{}'.format(
+                            self.db.campaign.id, self.db.result.id,
+                            checkpoint_)])
+                    steps.append(['snapshot', registers])
+                    timeout_ += 300
+                    monitored_checkpoints.append(checkpoint_)
+        self.running = True
+        try:
+            results = self.__run_driver(steps, timeout_)
+        except DrSEUsError as error:
+            if error.type == 'Timeout reading from Simics':
+                self.db.log_event(
+                    'Error', 'Simics', error.type, self.db.log_exception)
+                raise DrSEUsError('Error continuing simulation')
+            self.running = False
+            raise
+        self.running = False
+        injections = iter(injections)
+        snapshots = []
+        for step, result in zip(steps, results):
+            if step[0] == 'time':
+                time = float(result.strip().split('\n')[-1].split()[3])
+            elif step[0] == 'inject':
+                injection = next(injections)
+                injection.gold_value, injection.injected_value = \
+                    self.__config_values(injection, *result)
+                injection.time = time - self.db.campaign.start_time
+                self.__log_injection(injection)
+            elif step[0] == 'snapshot':
+                snapshots.append(result)
+        pool = self.__get_compare_pool()
+        if pool is None:
+            comparisons = [
+                self.__read_checkpoint(checkpoint, snapshot)
+                for checkpoint, snapshot in zip(monitored_checkpoints,
+                                                snapshots)]
+        else:
+            try:
+                comparisons = pool.starmap(
+                    self.__read_pool_checkpoint,
+                    zip(monitored_checkpoints, snapshots))
+            finally:
+                pool.close()
+                pool.join()
+        return self.__compare_in_order(comparisons)
+
+    def __get_compare_pool(self):
+        """
+        Returns a pool of threads for reading the monitored checkpoints while
+        the simulation continues, or None if they are read one at a time.
+        """
+        if self.options.compare_all and self.options.compare_workers > 1:
+            return ThreadPool(self.options.compare_workers)
+        return None
+
+    def __read_pool_checkpoint(self, *arguments):
+        """
+        Runs __read_checkpoint() in a pool thread, which closes the database
+        connection Django opened for the thread if anything was logged.
+        """
+        try:
+            return self.__read_checkpoint(*arguments)
+        finally:
+            connection.close()
+
+    def __compare_in_order(self, comparisons):
+        """
+        Logs the differences of the checkpoints read by __read_checkpoint() (or
+        asynchronous results of it) in the order they were simulated, so the
+        diffs and the number of errors do not depend on the pool.
+        """
+        reg_errors = 0
+        mem_errors = 0
+        for comparison in comparisons:
+            if not isinstance(comparison, tuple):
+                comparison = comparison.get()
+            errors, mem_errors_ = self.__compare_checkpoint(*comparison)
+            if errors > reg_errors:
+                reg_errors = errors
+            if mem_errors_ > mem_errors:
+                mem_errors = mem_errors_
+        return reg_errors, mem_errors
+
+    def __inject_config(self, injected_checkpoint, injection, gold=None):
+        """
+        Injects a fault in the config of injected_checkpoint, which is an
+        unmodified copy of the gold checkpoint if gold is given, so its
+        objects can be shared with other injections in that checkpoint.
+        """
+        with simics_config(injected_checkpoint, lazy=True,
+                           cache=gold_config_cache if gold else None,
+                           source=gold) as config:
+            config_object = injection.config_object
+            if injection.register_alias is None:
+                register = injection.register
+            else:
+                register = injection.register_alias
+            gold_value = config.get(config_object, register)
+            if gold_value is None:
+                raise Exception('error getting register value from config')
+            if injection.register_index is None:
+                if not injection.injected_value:
+                    injected_value = self.__flip_bit(injection, gold_value)
                 else:
-                    register = injection.register_alias
-                gold_value = config.get(config_object, register)
-                if gold_value is None:
-                    raise Exception('error getting register value from config')
-                if injection.register_index is None:
-                    if not injection.injected_value:
-                        injected_value = flip_bit(gold_value, injection.bit)
-                    else:
-                        injected_value = injection.injected_value
-                    config.set(config_object, register, injected_value)
+                    injected_value = injection.injected_value
+                config.set(config_object, register, injected_value)
+            else:
+                target = self.targets[injection.target]
+                if 'type' in target and target['type'] == 'gcache' and \
+                        injection.field == 'data':
+                    cache_data = True
                 else:
-                    target = self.targets[injection.target]
-                    if 'type' in target and target['type'] == 'gcache' and \
-                            injection.field == 'data':
-                        cache_data = True
-                    else:
-                        cache_data = False
-                    register_list_ = register_list = gold_value
-                    if not injection.injected_value:
-                        for index in injection.register_index:
-                            gold_value = gold_value[index]
-                        if cache_data:
-                            if isinstance(gold_value, data_list):
-                                gold_value = '0x'+gold_value[0]
-                            elif isinstance(gold_value, str) and \
-                                    gold_value[0] == '[' \
-                                    and gold_value[-1] == ']':
-                                # for some reason we might get
-                                # string '[000...000]' instead of a data_list
-                                gold_value = '0x'+gold_value[1:-1]
-                            else:
-                                raise Exception('got unexpected cache data')
-                        injected_value = flip_bit(gold_value, injection.bit)
+                    cache_data = False
+                # the gold value may be shared with the config cache, so only
+                # the lists containing the injected value are copied
+                register_list_ = register_list = type(gold_value)(gold_value)
+                if not injection.injected_value:
+                    for index in injection.register_index:
+                        gold_value = gold_value[index]
+                    injected_value = None
+                    if cache_data:
+                        if isinstance(gold_value, data_bytes) and \
+                                len(gold_value) == 1 and \
+                                gold_value.width*8 == \
+                                self.__check_bit(injection):
+                            # flip the bit in the bytes of the line instead
+                            # of converting it to an integer and back
+                            injected_value = gold_value.flip_bit(
+                                injection.bit)
+                        if isinstance(gold_value, data_types):
+                            gold_value = '0x'+gold_value[0]
+                        elif isinstance(gold_value, str) and \
+                                gold_value[0] == '[' \
+                                and gold_value[-1] == ']':
+                            # for some reason we might get
+                            # string '[000...000]' instead of a data_list
+                            gold_value = '0x'+gold_value[1:-1]
+                        else:
+                            raise Exception('got unexpected cache data')
+                    if injected_value is None:
+                        injected_value = self.__flip_bit(injection,
+                                                         gold_value)
                         if cache_data:
                             bits = int(get_num_bits(
                                 injection.field, injection.register,
-                                injection.target, self.targets) / 4)  # hex bits
+                                injection.target, self.targets) / 4)  # hex
                             injected_value = data_list(
                                 [injected_value.replace('0x', '').zfill(bits)])
-                    else:
-                        injected_value = injection.injected_value
-                        if cache_data:
-                            injected_value = data_list(
-                                [injected_value.replace('0x', '')])
-                    for index in range(len(injection.register_index)-1):
-                        register_list_ = \
-                            register_list_[injection.register_index[index]]
-                    register_list_[injection.register_index[-1]] = \
-                        injected_value
-                    config.set(config_object, register, register_list)
+                else:
+                    injected_value = injection.injected_value
                     if cache_data:
-                        injected_value = '0x'+injected_value[0]
-                config.save()
-            return gold_value, injected_value
+                        injected_value = data_list(
+                            [injected_value.replace('0x', '')])
+                for index in injection.register_index[:-1]:
+                    register_list_[index] = \
+                        type(register_list_[index])(register_list_[index])
+                    register_list_ = register_list_[index]
+                register_list_[injection.register_index[-1]] = \
+                    injected_value
+                config.set(config_object, register, register_list)
+                if cache_data:
+                    injected_value = '0x'+injected_value[0]
+            config.save()
+        return gold_value, injected_value
 
-    # def __inject_checkpoint(self, injection_number, checkpoint,
-    #                         injection=None):
+    def __inject_checkpoint(self, injection_number, checkpoint, injection=None,
+                            chosen=None):
+        """
+        Writes the injected checkpoint for a new injection (which is chosen
+        here unless an injection created by __create_injection() is given as
+        chosen), or for an existing injection to regenerate it.
+        """
         if injection_number == 1:
             gold_checkpoint = 'simics-workspace/gold-checkpoints/{}/{}'.format(
                 self.db.campaign.id, checkpoint)
@@ -692,29 +1477,20 @@ class simics(object):
         injected_checkpoint = \
             'simics-workspace/injected-checkpoints/{}/{}/{}_injected'.format(
                 self.db.campaign.id, self.db.result.id, checkpoint)
+        self.__make_injected_checkpoints()
         makedirs(injected_checkpoint)
-        checkpoint_files = listdir(gold_checkpoint)
-        for checkpoint_file in checkpoint_files:
-            copyfile(join(gold_checkpoint, checkpoint_file),
-                     join(injected_checkpoint, checkpoint_file))
+        copy_checkpoint(gold_checkpoint, injected_checkpoint)
+        if injection_number > 1:
+            gold_checkpoint = None  # modified by the previous injection
         if injection is None:
-            injection = choose_injection(self.targets,
-                                         self.options.selected_target_indices)
-            injection = self.db.result.injection_set.create(
-                checkpoint=checkpoint, success=False, **injection)
-            target = self.targets[injection.target]
-            if 'type' in target and target['type'] == 'gcache':
-                injection.config_object = \
-                    self.targets[injection.target]['object']
+            if chosen is None:
+                injection = self.__create_injection(checkpoint)
             else:
-                injection.config_object = 'DUT_{}.{}'.format(
-                    self.board, self.targets[injection.target]['object'])
-            if injection.target_index is not None:
-                injection.config_object += '[{}]'.format(injection.target_index)
-            injection.save()
+                injection = chosen
             try:
                 injection.gold_value, injection.injected_value = \
-                    inject_config(injected_checkpoint, injection)
+                    self.__inject_config(injected_checkpoint, injection,
+                                         gold_checkpoint)
             except KeyboardInterrupt:
                 raise KeyboardInterrupt
             except:
@@ -723,76 +1499,431 @@ class simics(object):
                     self.db.log_exception)
                 raise DrSEUsError('Error injecting fault')
             else:
-                injection.success = True
-                injection.save()
-                self.db.log_event(
-                    'Information', 'Simics', 'Fault injected')
-            if self.options.debug:
-                print(colored(
-                    'result id: {}\ncheckpoint number: {}\ntarget: {}\n'
-                    'register: {}\nfield: {}\nbit: {}\ngold value: {}\n'
-                    'injected value: {}'.format(
-                        self.db.result.id, checkpoint,  injection.target_name,
-                        injection.register, injection.field, injection.bit,
-                        injection.gold_value, injection.injected_value),
-                    'magenta'))
-                if injection.register_index is not None:
-                    print(colored('register index: {}'.format(
-                        injection.register_index), 'magenta'))
+                self.__log_injection(injection)
         else:
-            inject_config(injected_checkpoint, injection)
+            self.__inject_config(injected_checkpoint, injection,
+                                 gold_checkpoint)
         return injected_checkpoint.replace('simics-workspace/', ''), injection
 
-    def __compare_checkpoints(self, checkpoint, last_checkpoint):
+    def __get_register_names(self):
+        """
+        Returns the names of the registers of the targets specified in
+        simics_targets.py, grouped by config object.
+        """
+        registers = {}
+        for target in self.targets:
+            if 'count' in self.targets[target]:
+                count = self.targets[target]['count']
+            else:
+                count = 1
+            for target_index in range(count):
+                if 'type' in self.targets[target] and \
+                        self.targets[target]['type'] == 'gcache':
+                    config_object = self.targets[target]['object']
+                else:
+                    config_object = 'DUT_{}.{}'.format(
+                        self.board, self.targets[target]['object'])
+                if count > 1:
+                    config_object += '[{}]'.format(target_index)
+                if config_object not in registers:
+                    registers[config_object] = []
+                for register in self.targets[target]['registers']:
+                    if 'alias' in self.targets[target]['registers'][register]:
+                        register = (self.targets[target]['registers']
+                                                [register]['alias']
+                                                ['register'])
+                    if register not in registers[config_object]:
+                        registers[config_object].append(register)
+        return registers
+
+    def __get_registers(self, checkpoint, gold=False):
+        """
+        Retrieves all the register values of the targets specified in
+        simics_targets.py for the specified checkpoint and returns a
+        dictionary with all the values. The objects of gold checkpoints are
+        cached, so their values must not be modified.
+        """
+        with simics_config('simics-workspace/{}'.format(checkpoint),
+                           lazy=True,
+                           cache=gold_config_cache if gold else None) \
+                as config:
+            registers = {}
+            for config_object, register_names in \
+                    self.__get_register_names().items():
+                registers[config_object] = {}
+                for register in register_names:
+                    registers[config_object][register] = \
+                        config.get(config_object, register)
+        return registers
+
+    def __get_digest(self, checkpoint):
+        digest_file = get_digest_file(
+            'simics-workspace/gold-checkpoints/{}/{}'.format(
+                self.db.campaign.id, checkpoint))
+        if exists(digest_file):
+            return read_digest(digest_file)
+        return None
+
+    def __get_gold_registers(self, checkpoint, digest=None):
+        """
+        Returns the gold register values of the targets for checkpoint, from
+        its digest if it contains all of them.
+        """
+        register_names = self.__get_register_names()
+        if digest is not None and all(
+                config_object in digest[0] and
+                all(register in digest[0][config_object]
+                    for register in registers)
+                for config_object, registers in register_names.items()):
+            return {config_object: {register: digest[0][config_object][register]
+                                    for register in registers}
+                    for config_object, registers in register_names.items()}
+        return self.__get_registers(self.__get_gold_checkpoint(checkpoint),
+                                    gold=True)
+
+    def __start_fill_worker(self, first_checkpoint, last_checkpoint):
+        """
+        Starts a Simics process which creates the gold checkpoints between
+        first_checkpoint and last_checkpoint (both already written) while the
+        application continues running. It also recreates last_checkpoint,
+        which must match the original for the simulation to be deterministic.
+        """
+        cwd = '{}/simics-workspace'.format(getcwd())
+        commands = ['read-configuration gold-checkpoints/{}/{}'.format(
+            self.db.campaign.id, first_checkpoint)]
+        if self.db.campaign.caches:
+            commands.extend([
+                'DUT_p2020rdb.soc.cpu[0].instruction-fetch-mode '
+                'mode = instruction-fetch-trace',
+                'DUT_p2020rdb.soc.cpu[1].instruction-fetch-mode '
+                'mode = instruction-fetch-trace'])
+        for checkpoint in range(first_checkpoint+1, last_checkpoint+1):
+            commands.append('run-cycles {}'.format(
+                self.db.campaign.cycles_between))
+            commands.append('write-configuration gold-checkpoints/{}/{}{}'
+                            ''.format(self.db.campaign.id, checkpoint,
+                                      '_verify'
+                                      if checkpoint == last_checkpoint
+                                      else ''))
+        commands.append('quit')
+        script = '{}/gold-checkpoints/{}/{}.simics'.format(
+            cwd, self.db.campaign.id, first_checkpoint)
+        with open(script, 'w') as script_file:
+            script_file.write('\n'.join(commands)+'\n')
+        # the output is written to a file, since it is not read until every
+        # checkpoint has been written
+        with open('{}.log'.format(script), 'w') as log_file:
+            worker = Popen(
+                ['{}/simics'.format(cwd), '-no-win', '-no-gui', '-q',
+                 '-batch-mode', '-stall' if self.db.campaign.caches else '',
+                 script],
+                cwd=cwd, stdout=log_file, stderr=STDOUT)
+        return first_checkpoint, last_checkpoint, worker
+
+    def __fill_checkpoints(self, workers):
+        """
+        Waits for the workers started by __start_fill_worker() and verifies
+        the checkpoints they recreated.
+        """
+        event = self.db.log_event(
+            'Information', 'Simics', 'Created gold checkpoints in parallel',
+            success=False, campaign=True)
+        cwd = '{}/simics-workspace'.format(getcwd())
+        errors = False
+        for first_checkpoint, last_checkpoint, worker in workers:
+            worker.wait()
+            script = '{}/gold-checkpoints/{}/{}.simics'.format(
+                cwd, self.db.campaign.id, first_checkpoint)
+            with open('{}.log'.format(script), errors='replace') as log_file:
+                self.db.campaign.debugger_output += log_file.read()
+            remove(script)
+            remove('{}.log'.format(script))
+            if worker.returncode:
+                errors = True
+        self.db.save()
+        if errors:
+            self.db.log_event(
+                'Error', 'Simics', 'Error creating gold checkpoints',
+                campaign=True)
+            raise DrSEUsError('Error creating gold checkpoints')
+        for first_checkpoint, last_checkpoint, worker in workers:
+            verify_checkpoint = 'gold-checkpoints/{}/{}_verify'.format(
+                self.db.campaign.id, last_checkpoint)
+            gold_checkpoint = self.__get_gold_checkpoint(last_checkpoint)
+            merged_checkpoint = self.__merge_checkpoint(verify_checkpoint)
+            deterministic = self.__registers_match(
+                self.__get_registers(gold_checkpoint),
+                self.__get_registers(merged_checkpoint)) and not any(
+                    self.__get_changed_blocks(gold_ram, monitored_ram)[0]
+                    for gold_ram, monitored_ram in zip(
+                        self.__get_ram_images(gold_checkpoint),
+                        self.__get_ram_images(merged_checkpoint)))
+            rmtree('simics-workspace/{}'.format(verify_checkpoint))
+            rmtree('simics-workspace/{}'.format(merged_checkpoint))
+            if not deterministic:
+                self.db.log_event(
+                    'Error', 'Simics', 'Nondeterministic gold checkpoints',
+                    'Checkpoint {} differs when created from checkpoint {}'
+                    ''.format(last_checkpoint, first_checkpoint),
+                    campaign=True)
+                raise DrSEUsError('Nondeterministic gold checkpoints')
+        event.success = True
+        event.timestamp = datetime.now()
+        event.save()
+
+    def __create_digests(self):
+        """
+        Creates the digest of every gold checkpoint, merged gold checkpoints
+        which did not already exist are removed once they are digested.
+        """
+        event = self.db.log_event(
+            'Information', 'Simics', 'Created gold checkpoint digests',
+            success=False, campaign=True)
+        cwd = '{}/simics-workspace'.format(getcwd())
+        for checkpoint in range(1, self.db.campaign.checkpoints+1):
+            merged = exists('simics-workspace/gold-checkpoints/{}/{}_merged'
+                            ''.format(self.db.campaign.id, checkpoint))
+            gold_checkpoint = self.__get_gold_checkpoint(checkpoint)
+            images = []
+            for gold_ram in self.__get_ram_images(gold_checkpoint):
+                block_size = self.__get_block_size(gold_ram)
+                images.append(
+                    (block_size, hash_image(gold_ram, block_size, cwd)))
+            digest_file = get_digest_file(
+                'simics-workspace/gold-checkpoints/{}/{}'.format(
+                    self.db.campaign.id, checkpoint))
+            write_digest(digest_file, self.__get_registers(gold_checkpoint),
+                         images)
+            if not merged:
+                rmtree('simics-workspace/{}'.format(gold_checkpoint))
+        event.success = True
+        event.timestamp = datetime.now()
+        event.save()
+
+    def __get_gold_checkpoint(self, checkpoint):
+        gold_incremental_checkpoint = 'gold-checkpoints/{}/{}'.format(
+            self.db.campaign.id, checkpoint)
+        gold_checkpoint = '{}_merged'.format(gold_incremental_checkpoint)
+        if not exists('simics-workspace/{}'.format(gold_checkpoint)):
+            # other processes may need the same merged gold checkpoint, so it
+            # is merged by only one of them while the others wait for it, and
+            # it is renamed into place once it is complete
+            with checkpoint_lock('simics-workspace/{}'.format(gold_checkpoint)):
+                if not exists('simics-workspace/{}'.format(gold_checkpoint)):
+                    partial_checkpoint = '{}.{}'.format(gold_checkpoint,
+                                                        getpid())
+                    if exists('simics-workspace/{}'.format(
+                            partial_checkpoint)):
+                        rmtree('simics-workspace/{}'.format(
+                            partial_checkpoint))
+                    self.__merge_checkpoint(
+                        gold_incremental_checkpoint,
+                        merged_checkpoint=partial_checkpoint)
+                    rename('simics-workspace/{}'.format(partial_checkpoint),
+                           'simics-workspace/{}'.format(gold_checkpoint))
+        return gold_checkpoint
+
+    def __merge_gold_checkpoints(self):
+        """
+        Merges every gold checkpoint using multiple merge processes, so
+        injection processes never have to wait for them.
+        """
+        event = self.db.log_event(
+            'Information', 'Simics', 'Merged gold checkpoints',
+            success=False, campaign=True)
+        pool = ThreadPool(self.options.merge_gold)
+        try:
+            pool.map(self.__get_gold_checkpoint,
+                     range(1, self.db.campaign.checkpoints+1))
+        finally:
+            pool.close()
+            pool.join()
+        event.success = True
+        event.timestamp = datetime.now()
+        event.save()
+
+    def __run_timeout(self, cycles):
+        """
+        Returns the timeout for running cycles (which may span several
+        checkpoints), which is derived from the slowest gold execution when
+        using options.adaptive_timeout.
+        """
+        if self.options.adaptive_timeout and self.db.campaign.wall_time_max:
+            return ceil(self.options.adaptive_timeout *
+                        self.db.campaign.wall_time_max *
+                        cycles / self.db.campaign.cycles +
+                        self.options.timeout_margin)
+        return (1200 if self.db.campaign.caches
+                else 300 if self.options.compare_all else 600)
 
-        def compare_registers(checkpoint, gold_checkpoint,
-                              monitored_checkpoint):
+    def __get_ram_objects(self):
+        if self.board == 'p2020rdb':
+            return ['DUT_{}.soc.ram_image[0]'.format(self.board)]
+        elif self.board == 'a9x2':
+            return ['DUT_{}.coretile.ddr_image[{}]'.format(self.board, index)
+                    for index in range(2)]
+
+    def __get_ram_images(self, checkpoint, layered=False):
+        if layered:
+            cwd = '{}/simics-workspace'.format(getcwd())
+            return [image_layers(checkpoint, ram_object, cwd)
+                    for ram_object in self.__get_ram_objects()]
+        return ['{}/{}.craff'.format(checkpoint, ram_object)
+                for ram_object in self.__get_ram_objects()]
+
+    def __get_monitored_checkpoint(self, incremental_checkpoint):
+        """
+        Returns the checkpoint to compare for incremental_checkpoint. It is
+        merged unless --no_merge is used, in which case its registers are read
+        from its own config and its RAM images from their layers.
+        """
+        if self.options.no_merge:
+            return incremental_checkpoint
+        monitored_checkpoint = '{}_merged'.format(incremental_checkpoint)
+        if not exists('simics-workspace/{}'.format(monitored_checkpoint)):
+            self.__merge_checkpoint(incremental_checkpoint)
+        return monitored_checkpoint
+
+    def __get_changed_blocks(self, gold_ram, monitored_ram,
+                             extract_path=None):
+        """
+        Returns the addresses of the blocks of monitored_ram that differ from
+        gold_ram and the block size of the images. If extract_path is given,
+        the contents of these blocks in both images are written to it.
+        """
+        cwd = '{}/simics-workspace'.format(getcwd())
+        block_size = self.__get_block_size(gold_ram)
+        # gold images do not change, so each one is only decompressed once
+        # per campaign
+        gold_raw = 'injected-checkpoints/{}/gold-images/{}.raw'.format(
+            self.db.campaign.id, relpath(gold_ram, 'gold-checkpoints/{}'.format(
+                self.db.campaign.id)).replace('/', '_'))
+        with craff_image(gold_ram, cwd, keep=gold_raw) as gold, \
+                craff_image(monitored_ram, cwd) as monitored:
+            changed_blocks_ = diff_images(gold, monitored, block_size)
+            if extract_path is not None and changed_blocks_:
+                makedirs(extract_path, exist_ok=True)
+                extract_blocks(gold, changed_blocks_, block_size,
+                               extract_path+'/{:#x}_gold.raw')
+                extract_blocks(monitored, changed_blocks_, block_size,
+                               extract_path+'/{:#x}_monitored.raw')
+        return changed_blocks_, block_size
+
+    def __get_block_size(self, image):
+        # images of gold checkpoints do not change, so their block sizes are
+        # only read once
+        if image not in self.block_sizes:
+            cwd = '{}/simics-workspace'.format(getcwd())
+            craff_output = check_output(
+                ['{}/bin/craff'.format(cwd), '--info', image], cwd=cwd,
+                universal_newlines=True)
+            self.block_sizes[image] = \
+                int(findall(r'\d+', craff_output.split('\n')[2])[1])
+        return self.block_sizes[image]
+
+    def __get_memory_diffs(self, checkpoint, monitored_checkpoint,
+                           digest=None, extract=False):
+        """
+        Returns the addresses of the changed blocks and the block size of each
+        RAM image of monitored_checkpoint. The blocks are compared with the
+        digest of the gold checkpoint if there is one, otherwise (or when
+        extracting the changed blocks) with the merged gold checkpoint.
+        """
+        monitored_rams = self.__get_ram_images(monitored_checkpoint,
+                                               self.options.no_merge)
+        if digest is None or extract:
+            gold_rams = self.__get_ram_images(
+                self.__get_gold_checkpoint(checkpoint))
+            extract_path = 'simics-workspace/{}/memory-blocks'.format(
+                monitored_checkpoint) if extract else None
+            return [self.__get_changed_blocks(gold_ram, monitored_ram,
+                                              extract_path)
+                    for gold_ram, monitored_ram
+                    in zip(gold_rams, monitored_rams)]
+        cwd = '{}/simics-workspace'.format(getcwd())
+        diffs = []
+        for (block_size, gold_hashes), monitored_ram in \
+                zip(digest[1], monitored_rams):
+            diffs.append((changed_blocks(
+                gold_hashes, hash_image(monitored_ram, block_size, cwd)),
+                block_size))
+        return diffs
+
+    def __take_snapshot(self, checkpoint):
+        """
+        Returns the register values of the running simulation and the RAM
+        blocks that differ from the digest of the gold checkpoint, which the
+        driver finds by hashing the images inside Simics, so the state can be
+        compared without writing a checkpoint. Returns None if this is not
+        possible (no digest or registers which cannot be read).
+        """
+        digest = self.__get_digest(checkpoint)
+        if digest is None or not self.live_injection:
+            return None
+        digest_file = abspath(get_digest_file(
+            'simics-workspace/gold-checkpoints/{}/{}'.format(
+                self.db.campaign.id, checkpoint)))
+        images = []
+        for image_index, (ram_object, (block_size, hashes)) in enumerate(
+                zip(self.__get_ram_objects(), digest[1])):
+            hashes_file = get_hashes_file(digest_file, image_index)
+            write_hashes(hashes_file, hashes)
+            images.append([ram_object, block_size, hashes_file])
+        snapshot, changed_blocks_ = self.__run_driver(
+            [['snapshot', self.__get_register_names()], ['compare', images]],
+            timeout_=1200)
+        if any(value is None for registers in snapshot.values()
+               for value in registers.values()):
+            return None
+        return snapshot, [(blocks, block_size) for blocks, (block_size, hashes)
+                          in zip(changed_blocks_, digest[1])]
+
+    def __read_checkpoint(self, checkpoint, snapshot=None, memory_diffs=None):
+        """
+        Reads the registers of the monitored checkpoint (or uses the snapshot
+        registers read by the driver) and finds the RAM blocks that differ
+        from the gold checkpoint (unless the driver already found them).
+        Nothing is logged to the database, so this can run in a worker thread
+        while the simulation continues, and the result is passed to
+        __compare_checkpoint().
+        """
+        if memory_diffs is None:
+            monitored_checkpoint = self.__get_monitored_checkpoint(
+                'injected-checkpoints/{}/{}/{}'.format(
+                    self.db.campaign.id, self.db.result.id, checkpoint))
+        else:
+            monitored_checkpoint = None
+        digest = self.__get_digest(checkpoint)
+        gold_registers = self.__get_gold_registers(checkpoint, digest)
+        # registers read by the driver are used when all of them could be
+        # read, otherwise they are read from the checkpoint
+        if snapshot is not None and all(
+                value is not None
+                for registers in snapshot.values()
+                for value in registers.values()):
+            monitored_registers = snapshot
+        else:
+            monitored_registers = self.__get_registers(monitored_checkpoint)
+        if memory_diffs is None:
+            memory_diffs = self.__get_memory_diffs(
+                checkpoint, monitored_checkpoint, digest,
+                self.options.extract_blocks)
+        return checkpoint, gold_registers, monitored_registers, memory_diffs
+
+    def __compare_checkpoint(self, checkpoint, gold_registers,
+                             monitored_registers, memory_diffs):
+
+        def compare_registers():
             """
-            Compares the register values of the checkpoint for iteration
-            to the gold_checkpoint and adds the differences to the database.
+            Compares the monitored register values of the checkpoint for
+            iteration to the gold_registers and adds the differences to the
+            database.
             """
 
-            def get_registers(checkpoint):
-                """
-                Retrieves all the register values of the targets specified in
-                simics_targets.py for the specified checkpoint and returns a
-                dictionary with all the values.
-                """
-                with simics_config('simics-workspace/{}'.format(checkpoint)) \
-                        as config:
-                    registers = {}
-                    for target in self.targets:
-                        if 'count' in self.targets[target]:
-                            count = self.targets[target]['count']
-                        else:
-                            count = 1
-                        for target_index in range(count):
-                            if 'type' in self.targets[target] and \
-                                    self.targets[target]['type'] == 'gcache':
-                                config_object = self.targets[target]['object']
-                            else:
-                                config_object = 'DUT_{}.{}'.format(
-                                    self.board, self.targets[target]['object'])
-                            if count > 1:
-                                config_object += '[{}]'.format(target_index)
-                            if config_object not in registers:
-                                registers[config_object] = {}
-                            for register in self.targets[target]['registers']:
-                                if 'alias' in (self.targets[target]['registers']
-                                                           [register]):
-                                    register = \
-                                        (self.targets[target]['registers']
-                                                     [register]['alias']
-                                                     ['register'])
-                                if register not in registers[config_object]:
-                                    registers[config_object][register] = \
-                                        config.get(config_object, register)
-                return registers
-
             # watch out! we're gonna use recursion
             # keep your arms and legs inside the stack frame at all times
             def log_diffs(config_object, register, gold_value, monitored_value):
-                if isinstance(gold_value, data_list):
+                if isinstance(gold_value, data_types):
                     gold_value = '0x'+gold_value[0]
                 elif isinstance(gold_value, str) and gold_value[0] == '[' \
                         and gold_value[-1] == ']':
@@ -817,14 +1948,11 @@ class simics(object):
                         self.db.log_diff(checkpoint, config_object, register,
                                          gold_value, monitored_value)
 
-        # def compare_registers(checkpoint, gold_checkpoint,
-        #                       monitored_checkpoint):
+        # def compare_registers():
             # import pprint
-            gold_registers = get_registers(gold_checkpoint)
             # with open('gold_regs.txt', 'w') as gold_out:
             #     pp = pprint.PrettyPrinter(indent=4, stream=gold_out)
             #     pp.pprint(gold_registers)
-            monitored_registers = get_registers(monitored_checkpoint)
             # with open('mon_regs.txt', 'w') as mon_out:
             #     pp = pprint.PrettyPrinter(indent=4, stream=mon_out)
             #     pp.pprint(monitored_registers)
@@ -837,152 +1965,174 @@ class simics(object):
                 diffs = self.db.result.simics_register_diff_set.count()
             return diffs
 
-        def compare_memory(checkpoint, gold_checkpoint, monitored_checkpoint):
+        def compare_memory():
             """
-            Compare the memory contents of gold_checkpoint with
-            monitored_checkpoint and return the list of blocks that do not
-            match. If extract_blocks is true then extract any blocks that do not
-            match to incremental_checkpoint/memory-blocks/.
+            Adds the memory blocks that do not match the gold checkpoint to the
+            database (these were extracted to
+            incremental_checkpoint/memory-blocks/ by __read_checkpoint() if
+            extract_blocks is true).
             """
-
-            def parse_content_map(content_map, block_size):
-                """
-                Parse a content_map created by the Simics craff utility and
-                returns a list of the addresses of the image that contain data.
-                """
-                with open('simics-workspace/{}'.format(content_map), 'r') \
-                        as content_map:
-                    diff_addresses = []
-                    for line in content_map:
-                        if 'empty' not in line:
-                            line = line.split()
-                            base_address = int(line[0], 16)
-                            offsets = [index for index, value
-                                       in enumerate(line[1]) if value == 'D']
-                            for offset in offsets:
-                                diff_addresses.append(base_address +
-                                                      offset*block_size)
-                return diff_addresses
-
-            def extract_diff_blocks(gold_ram, monitored_ram,
-                                    incremental_checkpoint, addresses,
-                                    block_size):
-                """
-                Extract all of the blocks of size block_size specified in
-                addresses of both the gold_ram image and the monitored_ram
-                image.
-                """
-                if len(addresses) > 0:
-                    mkdir('{}/memory-blocks'.format(incremental_checkpoint))
-                    for address in addresses:
-                        check_call([craff, gold_ram,
-                                    '--extract={:#x}'.format(address),
-                                    '--extract-block-size={}'.format(
-                                        block_size),
-                                    '--output={}/memory-blocks/{:#x}_gold.raw'
-                                    ''.format(incremental_checkpoint, address)],
-                                   cwd=cwd)
-                        check_call([craff,  monitored_ram,
-                                    '--extract={:#x}'.format(address),
-                                    '--extract-block-size={}'.format(
-                                        block_size),
-                                    '--output={}/memory-blocks/{:#x}_monitored'
-                                    '.raw'.format(incremental_checkpoint,
-                                                  address)],
-                                   cwd=cwd)
-
-        # def compare_memory(checkpoint, gold_checkpoint, monitored_checkpoint):
-            if self.board == 'p2020rdb':
-                gold_rams = ['{}/DUT_{}.soc.ram_image[0].craff'.format(
-                    gold_checkpoint, self.board)]
-                monitored_rams = ['{}/DUT_{}.soc.ram_image[0].craff'.format(
-                    monitored_checkpoint, self.board)]
-            elif self.board == 'a9x2':
-                gold_rams = ['{}/DUT_{}.coretile.ddr_image[{}].craff'.format(
-                    gold_checkpoint, self.board, index) for index in range(2)]
-                monitored_rams = [
-                    '{}/DUT_{}.coretile.ddr_image[{}].craff'.format(
-                        monitored_checkpoint, self.board, index)
-                    for index in range(2)]
-            ram_diffs = ['{}.diff'.format(ram) for ram in monitored_rams]
-            diff_content_maps = ['{}.content_map'.format(diff)
-                                 for diff in ram_diffs]
             diffs = 0
-            cwd = '{}/simics-workspace'.format(getcwd())
-            craff = '{}/bin/craff'.format(cwd)
-            for (image_index, gold_ram, monitored_ram, ram_diff,
-                    diff_content_map) in zip(
-                        range(len(monitored_rams)), gold_rams, monitored_rams,
-                        ram_diffs, diff_content_maps):
-                check_call([craff, '--diff', gold_ram, monitored_ram,
-                            '--output={}'.format(ram_diff)],
-                           cwd=cwd, stdout=DEVNULL)
-                check_call([craff, '--content-map', ram_diff,
-                            '--output={}'.format(diff_content_map)],
-                           cwd=cwd, stdout=DEVNULL)
-                craff_output = check_output([craff, '--info', ram_diff],
-                                            cwd=cwd,
-                                            universal_newlines=True)
-                block_size = int(findall(r'\d+',
-                                         craff_output.split('\n')[2])[1])
-                changed_blocks = parse_content_map(diff_content_map,
-                                                   block_size)
-                diffs += len(changed_blocks)
-                if self.options.extract_blocks:
-                    extract_diff_blocks(gold_ram, monitored_ram,
-                                        monitored_checkpoint,
-                                        changed_blocks, block_size)
-                for block in changed_blocks:
+            for image_index, (changed_blocks_, block_size) in enumerate(
+                    memory_diffs):
+                diffs += len(changed_blocks_)
+                for block in changed_blocks_:
                     self.db.result.simics_memory_diff_set.create(
                         checkpoint=checkpoint,
                         image_index=image_index,
                         block=hex(block))
             return diffs
 
-    # def __compare_checkpoints(self, checkpoint, last_checkpoint):
-        reg_errors = 0
-        mem_errors = 0
-        if self.options.compare_all:
+    # def __compare_checkpoint(self, checkpoint, gold_registers,
+    #                          monitored_registers, memory_diffs):
+        reg_errors = compare_registers()
+        mem_errors = compare_memory()
+        return reg_errors, mem_errors
+
+    def __registers_match(self, gold_value, monitored_value):
+        """
+        Compares register values without logging differences, values that
+        could not be read from the simulation (None) are ignored.
+        """
+        if monitored_value is None:
+            return True
+        elif isinstance(gold_value, dict):
+            return all(self.__registers_match(gold_value[key],
+                                              monitored_value[key])
+                       for key in gold_value)
+        elif isinstance(gold_value, data_bytes):
+            return gold_value == monitored_value
+        elif isinstance(monitored_value, data_bytes):
+            return monitored_value == gold_value
+        elif isinstance(gold_value, data_list) or \
+                isinstance(monitored_value, data_list):
+            return list(gold_value) == list(monitored_value)
+        elif isinstance(gold_value, list):
+            return len(gold_value) == len(monitored_value) and all(
+                self.__registers_match(gold, monitored)
+                for gold, monitored in zip(gold_value, monitored_value))
+        elif isinstance(gold_value, str) and gold_value[0] == '[' and \
+                gold_value[-1] == ']':
+            return gold_value == monitored_value
+        else:
+            return int(monitored_value, base=0) == int(gold_value, base=0)
+
+    def __converged(self, checkpoint):
+        """
+        Returns True if the state of the simulation matches the gold
+        checkpoint, in which case the rest of the execution will match the
+        gold execution. Registers are read from the running simulation first
+        and the checkpoint is only written and its memory compared if they
+        match.
+        """
+        digest = self.__get_digest(checkpoint)
+        gold_registers = self.__get_gold_registers(checkpoint, digest)
+        snapshot = self.__run_driver(
+            [['snapshot', self.__get_register_names()]])[0]
+        if not self.__registers_match(gold_registers, snapshot):
+            return False
+        incremental_checkpoint = 'injected-checkpoints/{}/{}/{}'.format(
+            self.db.campaign.id, self.db.result.id, checkpoint)
+        self.__command('write-configuration {}'.format(
+            incremental_checkpoint), timeout_=300)
+        monitored_checkpoint = self.__get_monitored_checkpoint(
+            incremental_checkpoint)
+        # registers that cannot be read through attributes (caches) are
+        # compared using the checkpoint
+        if any(value is None for registers in snapshot.values()
+               for value in registers.values()) and \
+                not self.__registers_match(
+                    gold_registers,
+                    self.__get_registers(monitored_checkpoint)):
+            return False
+        return not any(
+            changed_blocks_ for changed_blocks_, block_size
+            in self.__get_memory_diffs(checkpoint, monitored_checkpoint,
+                                       digest))
+
+    def __compare_checkpoints(self, checkpoint, last_checkpoint,
+                              write_last=True):
+        # the simulation can only be stopped early after the last injection
+        converge = self.options.converge and \
+            last_checkpoint == self.db.campaign.checkpoints
+        if self.options.compare_all or converge:
             checkpoints = range(checkpoint+1, last_checkpoint+1)
             cycles_between = self.db.campaign.cycles_between
         else:
             checkpoints = [last_checkpoint]
             cycles_between = self.db.campaign.cycles_between * \
                 (last_checkpoint-checkpoint)
-        for checkpoint in checkpoints:
-            self.running = True
+        pool = self.__get_compare_pool()
+        comparisons = []
+        try:
+            for checkpoint in checkpoints:
+                self.running = True
+                try:
+                    self.__command('run-cycles {}'.format(cycles_between),
+                                   timeout_=self.__run_timeout(
+                                       cycles_between))
+                except DrSEUsError as error:
+                    self.db.log_event(
+                        'Error', 'Simics', error.type, self.db.log_exception)
+                    raise DrSEUsError('Error continuing simulation')
+                else:
+                    self.running = False
+                if converge and checkpoint < last_checkpoint and \
+                        self.__converged(checkpoint):
+                    self.db.log_event(
+                        'Information', 'Simics', 'Converged',
+                        'Matched gold checkpoint {}'.format(checkpoint))
+                    self.db.result.outcome_category = 'No error'
+                    self.db.result.outcome = 'Masked faults'
+                    self.db.result.cycles = self.db.campaign.cycles
+                    self.db.result.execution_time = \
+                        self.db.campaign.execution_time
+                    break
+                incremental_checkpoint = \
+                    'injected-checkpoints/{}/{}/{}'.format(
+                        self.db.campaign.id, self.db.result.id, checkpoint)
+                monitor = self.options.compare_all or \
+                    checkpoint == self.db.campaign.checkpoints
+                write = write_last and checkpoint == last_checkpoint
+                # intermediate states are compared without writing a
+                # checkpoint
+                if monitor and not write and self.options.snapshots and \
+                        not self.options.extract_blocks and \
+                        checkpoint < self.db.campaign.checkpoints:
+                    snapshot = self.__take_snapshot(checkpoint)
+                else:
+                    snapshot = None
+                # the checkpoint may already have been written to check
+                # convergence
+                if ((monitor and snapshot is None) or write) and \
+                        not exists('simics-workspace/{}'.format(
+                            incremental_checkpoint)):
+                    self.__command('write-configuration {}'.format(
+                        incremental_checkpoint), timeout_=300)
+                if monitor:
+                    arguments = (checkpoint,) if snapshot is None \
+                        else (checkpoint,)+snapshot
+                    # the checkpoint is read while simulating the next one
+                    if pool is None:
+                        comparisons.append(
+                            self.__read_checkpoint(*arguments))
+                    else:
+                        comparisons.append(pool.apply_async(
+                            self.__read_pool_checkpoint, arguments))
+        except BaseException:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            # the checkpoints read before the error are still logged, as they
+            # were when every checkpoint was compared before continuing
             try:
-                self.__command('run-cycles {}'.format(cycles_between),
-                               timeout_=1200 if self.db.campaign.caches
-                               else 300 if self.options.compare_all else 600)
-            except DrSEUsError as error:
+                self.__compare_in_order(comparisons)
+            except Exception:
                 self.db.log_event(
-                        'Error', 'Simics', error.type, self.db.log_exception)
-                raise DrSEUsError('Error continuing simulation')
-            else:
-                self.running = False
-            incremental_checkpoint = 'injected-checkpoints/{}/{}/{}'.format(
-                self.db.campaign.id, self.db.result.id, checkpoint)
-            monitor = self.options.compare_all or \
-                checkpoint == self.db.campaign.checkpoints
-            if monitor or checkpoint == last_checkpoint:
-                self.__command('write-configuration {}'.format(
-                    incremental_checkpoint), timeout_=300)
-            if monitor:
-                monitored_checkpoint = \
-                    self.__merge_checkpoint(incremental_checkpoint)
-                gold_incremental_checkpoint = 'gold-checkpoints/{}/{}'.format(
-                    self.db.campaign.id, checkpoint)
-                gold_checkpoint = '{}_merged'.format(
-                    gold_incremental_checkpoint)
-                if not exists('simics-workspace/{}'.format(gold_checkpoint)):
-                    self.__merge_checkpoint(gold_incremental_checkpoint)
-                errors = compare_registers(
-                    checkpoint, gold_checkpoint, monitored_checkpoint)
-                if errors > reg_errors:
-                    reg_errors = errors
-                errors = compare_memory(
-                    checkpoint, gold_checkpoint, monitored_checkpoint)
-                if errors > reg_errors:
-                    mem_errors = errors
-        return reg_errors, mem_errors
+                    'Error', 'Simics', 'Error comparing checkpoints',
+                    self.db.log_exception)
+            raise
+        if pool is not None:
+            pool.close()
+            pool.join()
+        return self.__compare_in_order(comparisons)
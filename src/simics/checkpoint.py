@@ -0,0 +1,127 @@
+"""
+Copyright (c) 2018 NSF Center for Space, High-performance, and Resilient Computing (SHREC)
+University of Pittsburgh. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided
+that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice,
+   this list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY EXPRESS OR IMPLIED WARRANTIES, 
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. 
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR 
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT 
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY
+OF SUCH DAMAGE.
+"""
+
+from contextlib import contextmanager
+from fcntl import flock, LOCK_EX, LOCK_UN
+from os import link, listdir, lstat, statvfs, symlink, walk
+from os.path import abspath, exists, join, relpath
+from re import fullmatch
+from shutil import copyfile
+
+from .config import simics_config
+
+# files that are rewritten after staging and must never share data with gold
+modified_files = ('config',)
+
+
+def link_file(source, destination):
+    """
+    Makes destination refer to the contents of source without copying them.
+    A hard link is used when possible, otherwise a symbolic link (e.g. when
+    source and destination are on different filesystems), and the file is
+    only copied if neither is supported.
+    """
+    try:
+        link(source, destination)
+    except OSError:
+        try:
+            symlink(abspath(source), destination)
+        except OSError:
+            copyfile(source, destination)
+
+
+def copy_checkpoint(checkpoint, destination):
+    """
+    Stages a copy of checkpoint in the (existing) destination directory.
+    Simics only reads the image files of a checkpoint it loads, so these are
+    linked instead of copied and only the config file is actually copied.
+    """
+    for checkpoint_file in listdir(checkpoint):
+        if checkpoint_file in modified_files:
+            copyfile(join(checkpoint, checkpoint_file),
+                     join(destination, checkpoint_file))
+        else:
+            link_file(join(checkpoint, checkpoint_file),
+                      join(destination, checkpoint_file))
+
+
+def directory_size(directory):
+    """
+    Returns the space used by the files in directory, without following links
+    (e.g. to gold checkpoint images).
+    """
+    size = 0
+    for root, dirs, files in walk(directory):
+        for file_ in files:
+            size += lstat(join(root, file_)).st_blocks * 512
+    return size
+
+
+def available_space(directory):
+    status = statvfs(directory)
+    return status.f_bavail * status.f_frsize
+
+
+def image_layers(checkpoint, image_object, cwd):
+    """
+    Returns the files (relative to cwd, oldest first) that make up the
+    contents of image_object in an incremental checkpoint, so it can be read
+    without merging the checkpoint. The file names in the files attribute of
+    the image are either in checkpoint or in one of the checkpoints it
+    depends on (sim->checkpoint_path), in which case they may refer to the
+    directory by its index with a %N% prefix.
+    """
+    checkpoint = join(cwd, checkpoint)
+    with simics_config(checkpoint, lazy=True) as config:
+        files = config.get(image_object, 'files')
+        paths = [path.strip('"')
+                 for path in config.get('sim', 'checkpoint_path') or []]
+    layers = []
+    for image_file in files:
+        name = image_file[0].strip('"')
+        match = fullmatch(r'%(\d+)%/(.*)', name)
+        if match is not None:
+            index, name = int(match.group(1)), match.group(2)
+            directories = paths[index:index+1] + [checkpoint] + paths
+        else:
+            directories = [checkpoint] + paths
+        for directory in directories:
+            if exists(join(directory, name)):
+                layers.append(relpath(join(directory, name), cwd))
+                break
+        else:
+            raise FileNotFoundError(
+                'could not find {} of {} in {} or its checkpoint_path'.format(
+                    name, image_object, checkpoint))
+    return layers
+
+
+@contextmanager
+def checkpoint_lock(checkpoint):
+    """
+    Holds an exclusive lock on checkpoint that is shared by every DrSEUs
+    process, using checkpoint.lock as the lock file.
+    """
+    with open('{}.lock'.format(checkpoint), 'w') as lock_file:
+        flock(lock_file, LOCK_EX)
+        try:
+            yield
+        finally:
+            flock(lock_file, LOCK_UN)
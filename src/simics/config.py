@@ -18,7 +18,11 @@ OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
 OF SUCH DAMAGE.
 """
 
-from ply import lex, yacc
+from collections import OrderedDict
+from os import getpid, replace, stat
+from os.path import abspath
+from re import compile, MULTILINE, VERBOSE
+from threading import get_ident, Lock
 
 
 class data_list(list):
@@ -26,183 +30,368 @@ class data_list(list):
     pass
 
 
-# LEX
-tokens = ('COMMENT', 'COLON', 'COMMA', 'ID', 'LBRAC', 'LINECOMMENT', 'LPAR',
-          'OBJECT', 'DATASTART', 'DATAEND', 'RBRAC', 'RPAR', 'STRING', 'TYPE')
-
-t_LPAR = r'\('
-t_RPAR = r'\)'
-t_LBRAC = r'{'
-t_RBRAC = r'}'
-t_COLON = r':'
-t_COMMA = r','
-t_DATAEND = r']'
-t_DATASTART = r'\['
-t_STRING = r'"(?:[^"\\]|\\.)*"'
-
-
-# use functions for most tokens to keep parse order
-def t_COMMENT(t):
-    r'/\*.*?\*/'
-    pass
-
-
-def t_LINECOMMENT(t):
-    r'\#.*\n'
-    pass
-
-
-def t_ID(t):
-    r'(\.|[A-Za-z0-9+/_*-]|\[[0-9]+\])+'
-    if t.value in ['OBJECT', 'TYPE']:
-        t.type = t.value
-    return t
-
-
-def t_newline(t):
-    r'\n+'
-    t.lineno += len(t.value)
-
-t_ignore = ' \t\r'
-
-
-def t_error(t):
-    print('Illegal character "{}"'.format(t.value[0]))
-    t.skip(1)
-
-
-# YACC
-def p_configuration(p):
-    'configuration : objects'
-    p[0] = p[1]
-
-
-def p_objects(p):
-    'objects : objects object'
-    (name, typ, attrs) = p[2]
-    p[0] = p[1]
-    p[0][name] = (typ, attrs)
-
-
-def p_objects_empty(p):
-    'objects : empty'
-    p[0] = {}
-
-
-def p_object(p):
-    'object : OBJECT ID TYPE ID LBRAC attributes RBRAC'
-    p[0] = (p[2], p[4], p[6])
-
-
-def p_attributes(p):
-    'attributes : attributes attribute'
-    (name, value) = p[2]
-    p[0] = p[1]
-    p[0][name] = value
-
-
-def p_attributes_empty(p):
-    'attributes : empty'
-    p[0] = {}
-
-
-def p_attribute(p):
-    'attribute : ID COLON value'
-    p[0] = (p[1], p[3])
-
-
-def p_value_id(p):
-    'value : ID'
-    p[0] = p[1]
-
-
-def p_value_string(p):
-    'value : STRING'
-    p[0] = p[1]
-
-
-def p_value_data(p):
-    'value : DATASTART datalist DATAEND'
-    p[0] = p[2]
-
-
-def p_datalist(p):
-    'datalist : datalist ID'
-    p[0] = data_list(p[1] + [p[2]])
-
-
-def p_datalist_empty(p):
-    'datalist : empty'
-    p[0] = data_list()
-
-
-def p_value_list(p):
-    'value : LPAR valuelist RPAR'
-    p[0] = p[2]
-
-
-def p_valuelist(p):
-    'valuelist : valuelist COMMA value'
-    p[0] = p[1]
-    p[0].append(p[3])
-
-
-def p_valuelist_value(p):
-    'valuelist : value'
-    p[0] = [p[1]]
-
-
-def p_valuelist_empty(p):
-    'valuelist : empty'
-    p[0] = []
-
-
-def p_value_dict(p):
-    'value : LBRAC pairs RBRAC'
-    p[0] = p[2]
-
-
-def p_pairs(p):
-    'pairs : pairs COMMA pair'
-    p[0] = p[1].copy()
-    p[0].update(p[3])
-
-
-def p_pairs_pair(p):
-    'pairs : pair'
-    p[0] = p[1]
-
-
-def p_pair(p):
-    'pair : value COLON value'
-    p[0] = {p[1]: p[3]}
-
-
-def p_pair_empty(p):
-    'pair : empty'
-    p[0] = {}
-
-
-def p_empty(p):
-    'empty :'
-    pass
-
-
-# dummy rule to avoid unused warnings
-def p_dummy(p):
-    'configuration : COMMENT LINECOMMENT'
-    pass
+class data_bytes(object):
+    """
+    A data list of lowercase hexadecimal values with the same number of
+    digits (e.g. the data of a cache line), stored as bytes instead of a list
+    of strings. Values are read like those of a data_list, or without copying
+    them through view().
+    """
+
+    __slots__ = ('data', 'width')
+
+    def __init__(self, data, width):
+        self.data = data
+        self.width = width  # bytes per value
+
+    def __len__(self):
+        return len(self.data) // self.width
+
+    def view(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('data_bytes index out of range')
+        return memoryview(self.data)[index*self.width:(index+1)*self.width]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return data_list(self[index_]
+                             for index_ in range(*index.indices(len(self))))
+        return self.view(index).hex()
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.view(index).hex()
+
+    def __eq__(self, other):
+        if isinstance(other, data_bytes):
+            return self.width == other.width and self.data == other.data
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'data_bytes({})'.format(self.text())
+
+    def text(self):
+        return ' '.join(self)
+
+    def flip_bit(self, bit, index=0):
+        """
+        Returns a copy with bit of the value at index flipped, where bit 0 is
+        the least significant bit of the value.
+        """
+        if not 0 <= bit < self.width*8:
+            raise IndexError('bit {} is out of range'.format(bit))
+        data = bytearray(self.data)
+        data[(index+1)*self.width-1-bit//8] ^= 1 << (bit % 8)
+        return data_bytes(bytes(data), self.width)
+
+
+# data lists of either type
+data_types = (data_list, data_bytes)
+hex_pattern = compile(r'[0-9a-f\s]*')
+
+
+def new_data_list(values):
+    """
+    Returns the data list of the whitespace separated values, which is a
+    data_bytes when they can be stored as one without changing their text.
+    """
+    values_list = values.split()
+    if values_list and hex_pattern.fullmatch(values):
+        width = len(values_list[0])
+        if width % 2 == 0 and all(len(value) == width
+                                  for value in values_list):
+            return data_bytes(bytes.fromhex(values), width // 2)
+    return data_list(values_list)
+
+
+# the #SIMICS-CONF-1 format is parsed by a single pass recursive descent
+# parser, since data lists of cache-enabled checkpoints can hold millions of
+# values (scripts/benchmark_config.py compares it with the old PLY parser)
+id_pattern = r'(?:\.|[A-Za-z0-9+/_*-]|\[[0-9]+\])+'
+# alternatives are tried in order, so an ID like "[0]" is not a data list
+token_pattern = compile(r'''
+      (?P<comment>/\*.*?\*/)
+    | (?P<linecomment>\#.*\n)
+    | (?P<id>{})
+    | (?P<space>[ \t\r\n]+)
+    | (?P<string>"(?:[^"\\]|\\.)*")
+    | (?P<punctuation>[(){{}}:,\[\]])
+'''.format(id_pattern), VERBOSE)
+ignored_tokens = ('comment', 'linecomment', 'space')
+# data lists without comments (which also match IDs) are matched at once and
+# split on whitespace
+data_pattern = compile(r'\[\s*((?:{0}(?:\s+{0})*)?)\s*\]'.format(id_pattern))
+
+
+# objects start at the beginning of a line, which is enough to find them
+# without tokenizing the attributes in between
+object_pattern = compile(r'^OBJECT[ \t]+({})[ \t]'.format(id_pattern).encode(),
+                         MULTILINE)
+# object indexes of the most recently used configs, by absolute path, which
+# are shared by the threads of the compare pool
+object_indexes = {}
+max_object_indexes = 256
+object_index_lock = Lock()
 
 
 class ParseError(Exception):
     pass
 
 
-def p_error(p):
-    raise ParseError(p)
+class config_parser(object):
+    """
+    Parses the contents of a config into a dictionary of objects, where each
+    object is a tuple of its type and a dictionary of its attributes. Values
+    are ID and string tokens (strings keep their quotes), data_lists, lists
+    and dictionaries. The spans of the attribute values and the position of
+    the closing brace of each object are kept in spans, so values can be
+    replaced without rewriting the rest of the config.
+    """
+
+    def __init__(self, contents):
+        self.contents = contents
+        self.position = 0
+        self.spans = {}
+        self.advance()
+
+    def advance(self):
+        # end of the token that is consumed
+        self.end = self.position
+        contents = self.contents
+        position = self.position
+        while True:
+            match = token_pattern.match(contents, position)
+            if match is None:
+                if position >= len(contents):
+                    self.kind = self.value = None
+                    self.start = self.position = position
+                    return
+                print('Illegal character "{}"'.format(contents[position]))
+                position += 1
+                continue
+            kind = match.lastgroup
+            position = match.end()
+            if kind not in ignored_tokens:
+                self.value = match.group()
+                self.kind = self.value if kind == 'punctuation' else kind
+                self.start = match.start()
+                self.position = position
+                return
+
+    def error(self):
+        if self.kind is None:
+            raise ParseError(None, 'unexpected end of config')
+        raise ParseError(self.contents.count('\n', 0, self.start)+1,
+                         'unexpected "{}"'.format(self.value))
+
+    def expect(self, kind, value=None):
+        if self.kind != kind or (value is not None and self.value != value):
+            self.error()
+        value = self.value
+        self.advance()
+        return value
+
+    def parse(self):
+        objects = {}
+        while self.kind is not None:
+            self.expect('id', 'OBJECT')
+            name = self.expect('id')
+            self.expect('id', 'TYPE')
+            type_ = self.expect('id')
+            self.expect('{')
+            attributes = {}
+            spans = {}
+            while self.kind == 'id':
+                attribute = self.value
+                self.advance()
+                self.expect(':')
+                start = self.start
+                attributes[attribute] = self.parse_value()
+                spans[attribute] = (start, self.end)
+            self.spans[name] = (spans, self.start)
+            self.expect('}')
+            objects[name] = (type_, attributes)
+        return objects
+
+    def parse_value(self):
+        kind = self.kind
+        if kind == 'id' or kind == 'string':
+            value = self.value
+            self.advance()
+            return value
+        elif kind == '[':
+            match = data_pattern.match(self.contents, self.start)
+            if match is not None and '/*' not in match.group(1):
+                self.position = match.end()
+                self.advance()
+                return new_data_list(match.group(1))
+            self.advance()
+            values = []
+            while self.kind == 'id':
+                values.append(self.value)
+                self.advance()
+            self.expect(']')
+            return new_data_list(' '.join(values))
+        elif kind == '(':
+            self.advance()
+            values = []
+            if self.kind != ')':
+                values.append(self.parse_value())
+                while self.kind == ',':
+                    self.advance()
+                    values.append(self.parse_value())
+            self.expect(')')
+            return values
+        elif kind == '{':
+            self.advance()
+            pairs = {}
+            while True:
+                if self.kind not in (',', '}'):
+                    key = self.parse_value()
+                    self.expect(':')
+                    pairs[key] = self.parse_value()
+                if self.kind != ',':
+                    break
+                self.advance()
+            self.expect('}')
+            return pairs
+        self.error()
+
+
+def get_object_index(config_file):
+    """
+    Returns a dictionary of the byte offsets (start, end) of each object in
+    config_file (in file order), which is cached until the file changes.
+    """
+    path = abspath(config_file)
+    status = stat(path)
+    key = (status.st_mtime_ns, status.st_size)
+    with object_index_lock:
+        if path in object_indexes and object_indexes[path][0] == key:
+            index = object_indexes.pop(path)[1]
+        else:
+            index = None
+    if index is None:
+        with open(path, 'rb') as config:
+            contents = config.read()
+        starts = [(match.group(1).decode(), match.start())
+                  for match in object_pattern.finditer(contents)]
+        index = {}
+        for (object_, start), (next_object, end) in zip(
+                starts, starts[1:]+[(None, len(contents))]):
+            index[object_] = (start, end)
+    cache_object_index(path, key, index)
+    return index
+
+
+def cache_object_index(path, key, index):
+    # dictionaries keep insertion order, so the first one is the least recent
+    with object_index_lock:
+        object_indexes.pop(path, None)
+        object_indexes[path] = (key, index)
+        while len(object_indexes) > max_object_indexes:
+            del object_indexes[next(iter(object_indexes))]
+
+
+def copy_range(source, destination, start, end):
+    """
+    Copies the bytes from start to end of the source file to the current
+    position of the (unbuffered) destination file, without reading them into
+    Python when the platform supports it.
+    """
+    try:
+        from os import copy_file_range
+    except ImportError:
+        copy_file_range = None
+    while start < end:
+        copied = 0
+        if copy_file_range is not None:
+            try:
+                copied = copy_file_range(source.fileno(),
+                                         destination.fileno(), end-start,
+                                         start)
+            except OSError:  # e.g. not supported by the filesystem
+                copy_file_range = None
+        if not copied:
+            source.seek(start)
+            data = source.read(end-start)
+            if not data:
+                break
+            destination.write(data)
+            copied = len(data)
+        start += copied
+
+
+class config_cache(object):
+    """
+    Parsed objects of configs that do not change (e.g. gold checkpoints),
+    keyed by the path, mtime and size of the config and the object name. The
+    least recently used objects are evicted when their estimated memory use
+    exceeds budget bytes. Cached values are shared, so they must not be
+    modified in place.
+    """
+
+    # estimated memory used by a parsed object per byte of its config text,
+    # in addition to the text itself, which is kept for saving (about 20
+    # bytes for integers and strings, but only about half a byte for the
+    # hexadecimal data lists stored as data_bytes)
+    parsed_size = 20
+    data_bytes_size = 0.5
+
+    def __init__(self, budget=0):
+        self.budget = budget
+        self.objects = OrderedDict()
+        self.size = 0
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key in self.objects:
+                self.objects.move_to_end(key)
+                return self.objects[key][0]
+        return None
+
+    def estimate_size(self, value, text_size):
 
-lex.lex(debug=0, optimize=1)
-yacc.yacc(debug=0, optimize=1)
+        def data_text_size(attribute):
+            if isinstance(attribute, data_bytes):
+                return len(attribute.data)*2 + len(attribute)
+            elif isinstance(attribute, (list, tuple)):
+                return sum(data_text_size(value) for value in attribute)
+            elif isinstance(attribute, dict):
+                return sum(data_text_size(value)
+                           for value in attribute.values())
+            return 0
+
+    # def estimate_size(self, value, text_size):
+        data_size = min(data_text_size(value), text_size)
+        return int(text_size + data_size*self.data_bytes_size +
+                   (text_size-data_size)*self.parsed_size)
+
+    def add(self, key, value, text_size):
+        size = self.estimate_size(value, text_size)
+        if size > self.budget:
+            return
+        with self.lock:
+            if key in self.objects:
+                return
+            self.objects[key] = (value, size)
+            self.size += size
+            while self.size > self.budget:
+                key, (value, size) = self.objects.popitem(last=False)
+                self.size -= size
+
+
+# shared by every simics_config in this process, the budget is set by the
+# --config_cache option
+gold_config_cache = config_cache()
 
 
 class SimicsConfigError(Exception):
@@ -216,35 +405,99 @@ class SimicsConfigError(Exception):
 
 
 class simics_config(object):
-    def __init__(self, checkpoint):
+    """
+    The objects of the config of checkpoint. When lazy, only the offsets of
+    the objects are read when entered and each object is parsed the first
+    time it is accessed. Saving only replaces the values of the attributes
+    that were set and copies the rest of the config unchanged.
+    """
+
+    def __init__(self, checkpoint, lazy=False, cache=None, source=None):
+        """
+        A lazy config can use a config_cache for its objects, which are keyed
+        by the config of source when it is an unmodified copy of another
+        checkpoint.
+        """
         self.checkpoint = checkpoint
+        self.config_file = '{}/config'.format(checkpoint)
+        self.lazy = lazy
+        self.cache = cache if lazy else None
+        self.source_file = '{}/config'.format(
+            checkpoint if source is None else source)
+        # objects that are shared with the cache
+        self.cached = set()
+        # (byte offset, contents, spans) of the text each object was parsed
+        # from and the attributes that were set since
+        self.sources = {}
+        self.modified = {}
 
     def __enter__(self):
         try:
-            with open('{}/config'.format(self.checkpoint), 'r') as config_file:
-                config_contents = config_file.read()
+            if self.lazy:
+                self.index = get_object_index(self.source_file)
+                self.config = {}
+                if self.cache is not None:
+                    status = stat(self.source_file)
+                    self.cache_key = (abspath(self.source_file),
+                                      status.st_mtime_ns, status.st_size)
+            else:
+                with open(self.config_file, 'r') as config_file:
+                    self.config = self.__parse(config_file.read())
         except EnvironmentError as error:
             raise SimicsConfigError(
                 'Error reading checkpoint: {}'.format(error))
+        return self
+
+    def __parse(self, config_contents, offset=0):
+        parser = config_parser(config_contents)
         try:
-            self.config = yacc.parse(config_contents)
+            objects = parser.parse()
         except RuntimeError as error:
             raise SimicsConfigError('Parse error in {}'.format(self.checkpoint),
                                     error)
         except ParseError as error:
-            if error.args and error.args[0]:
-                raise SimicsConfigError(
-                    'Syntax error in {}:{}'.format(
-                        self.checkpoint, error.args[0].lineno),
-                    error)
+            line, reason = error.args
             raise SimicsConfigError(
-                'Unknown parse error in {}'.format(self.checkpoint), error)
-        return self
+                'Syntax error in {}{}'.format(
+                    self.checkpoint, ':{}'.format(line) if line else ''),
+                reason)
+        for object_, spans in parser.spans.items():
+            self.sources[object_] = (offset, config_contents, spans)
+        return objects
+
+    def __get_object(self, object_):
+        if self.lazy and object_ not in self.config and object_ in self.index:
+            if self.cache is not None:
+                cached = self.cache.get(self.cache_key+(object_,))
+                if cached is not None:
+                    self.config[object_], self.sources[object_] = cached
+                    self.cached.add(object_)
+                    return self.config[object_]
+            start, end = self.index[object_]
+            try:
+                with open(self.config_file, 'rb') as config_file:
+                    config_file.seek(start)
+                    contents = config_file.read(end-start).decode()
+            except EnvironmentError as error:
+                raise SimicsConfigError(
+                    'Error reading checkpoint: {}'.format(error))
+            objects = self.__parse(contents, start)
+            self.config.update(objects)
+            if self.cache is not None:
+                for parsed_object in objects:
+                    self.cache.add(self.cache_key+(parsed_object,),
+                                   (objects[parsed_object],
+                                    self.sources[parsed_object]),
+                                   end-start)
+                    self.cached.add(parsed_object)
+        return self.config.get(object_)
 
     def save(self):
 
         def attribute_string(attribute):
-            if isinstance(attribute, data_list):
+            if isinstance(attribute, data_bytes):
+                return '['+attribute.text()+']'
+            elif isinstance(attribute, data_list):
                 return '['+' '.join(attribute_string(value)
                                     for value in attribute)+']'
             elif isinstance(attribute, list):
@@ -256,29 +509,85 @@ class simics_config(object):
                                     in attribute)+'}'
             return attribute
 
+        def byte_offset(offset, contents, position):
+            if contents.isascii():
+                return offset+position
+            return offset+len(contents[:position].encode())
+
+        def shift(position):
+            return position + sum(len(replacement)-(end-start)
+                                  for start, end, replacement in edits
+                                  if end <= position)
+
     # def save(self):
-        with open(self.checkpoint+'/config', 'w') as config_file:
-            config_file.write('#SIMICS-CONF-1\n')
-            for object_ in self.config:
-                (type_, attirbutes) = self.config[object_]
-                config_file.write(
-                    'OBJECT {} TYPE {} {}\n'.format(object_, type_, '{'))
-                for attribute in attirbutes:
-                    config_file.write('\t{}: {}\n'.format(
-                        attribute, attribute_string(attirbutes[attribute])))
-                config_file.write('}\n')
+        edits = []
+        for object_, attributes in self.modified.items():
+            offset, contents, (spans, brace) = self.sources[object_]
+            for attribute in attributes:
+                value = attribute_string(
+                    self.config[object_][1][attribute]).encode()
+                if attribute in spans:
+                    start, end = spans[attribute]
+                    edits.append((byte_offset(offset, contents, start),
+                                  byte_offset(offset, contents, end), value))
+                else:
+                    position = byte_offset(offset, contents, brace)
+                    edits.append((position, position, b'\t' +
+                                  attribute.encode()+b': '+value+b'\n'))
+        if not edits:
+            return
+        edits.sort()
+        # the config is written next to the original and renamed over it,
+        # since the unchanged parts are copied from the original
+        temporary_file = '{}.{}.{}'.format(self.config_file, getpid(),
+                                           get_ident())
+        with open(self.config_file, 'rb') as config_file, \
+                open(temporary_file, 'wb', buffering=0) as new_config_file:
+            position = 0
+            for start, end, replacement in edits:
+                copy_range(config_file, new_config_file, position, start)
+                new_config_file.write(replacement)
+                position = end
+            copy_range(config_file, new_config_file, position,
+                       config_file.seek(0, 2))
+        replace(temporary_file, self.config_file)
+        # objects are parsed again from the saved config when accessed, and
+        # the index is updated so the saved config is not scanned again
+        if self.lazy:
+            self.index = {object_: (shift(start), shift(end))
+                          for object_, (start, end) in self.index.items()}
+            status = stat(self.config_file)
+            cache_object_index(abspath(self.config_file),
+                               (status.st_mtime_ns, status.st_size),
+                               self.index)
+        else:
+            self.index = get_object_index(self.config_file)
+            self.lazy = True
+        # the saved config no longer matches the cached objects
+        self.cache = None
+        self.cached = set()
+        self.config = {}
+        self.sources = {}
+        self.modified = {}
 
     def get(self, object_, attribute):
-        if object_ in self.config:
-            (type_, attirbutes) = self.config[object_]
+        object_ = self.__get_object(object_)
+        if object_ is not None:
+            (type_, attirbutes) = object_
             if attribute in attirbutes:
                 return attirbutes[attribute]
         return None
 
     def set(self, object_, attribute, value):
-        if object_ in self.config:
-            (type_, attirbutes) = self.config[object_]
+        config_object = self.__get_object(object_)
+        if config_object is not None:
+            (type_, attirbutes) = config_object
+            if object_ in self.cached:
+                attirbutes = dict(attirbutes)
+                self.config[object_] = (type_, attirbutes)
+                self.cached.discard(object_)
             attirbutes[attribute] = value
+            self.modified.setdefault(object_, set()).add(attribute)
 
     def __exit__(self, type_, value, traceback):
         if type_ is not None or value is not None or traceback is not None:
@@ -0,0 +1,194 @@
+"""
+Copyright (c) 2018 NSF Center for Space, High-performance, and Resilient Computing (SHREC)
+University of Pittsburgh. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided
+that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice,
+   this list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY EXPRESS OR IMPLIED WARRANTIES, 
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. 
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR 
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT 
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY
+OF SUCH DAMAGE.
+"""
+
+from mmap import ACCESS_READ, mmap
+from os import fstat, getpid, lseek, makedirs, remove, replace
+from os.path import dirname, exists
+from subprocess import check_call, DEVNULL
+from threading import get_ident
+
+try:
+    from os import SEEK_DATA, SEEK_HOLE
+except ImportError:  # holes cannot be found on this platform
+    SEEK_DATA = SEEK_HOLE = None
+
+# the craff format is not documented, so images are decompressed once with the
+# craff utility into a raw file which is then memory-mapped and compared or
+# extracted from directly instead of running craff for every operation, and
+# raw gold images are kept so they are only decompressed once per campaign
+# (scripts/benchmark_craff.py compares this with craff --diff/--content-map)
+
+# number of blocks compared at once before looking for the individual blocks
+# that differ
+blocks_per_chunk = 256
+
+
+def is_sparse(raw_file, size):
+    """
+    Returns True if the holes of raw_file can be found with SEEK_DATA, which
+    requires the platform to support it and craff to have left holes in place
+    of empty regions (the file uses less space than its size).
+    """
+    return SEEK_DATA is not None and \
+        fstat(raw_file.fileno()).st_blocks*512 < size
+
+
+def data_regions(raw_file, size):
+    """
+    Yields the (start, end) offsets of the regions of raw_file which are not
+    holes, raw_file must be sparse.
+    """
+    fd = raw_file.fileno()
+    offset = 0
+    while offset < size:
+        try:
+            start = lseek(fd, offset, SEEK_DATA)
+        except OSError:  # no data after offset
+            return
+        end = lseek(fd, start, SEEK_HOLE)
+        yield start, end
+        offset = end
+
+
+class craff_image(object):
+    """
+    The uncompressed contents of a craff image (relative to cwd), which is
+    decompressed when entered and removed when exited. The image can also be
+    a list of the layers of an image in an incremental checkpoint (oldest
+    first), which craff merges while decompressing them. If keep is given, the
+    decompressed image is kept in that file (relative to cwd) instead and is
+    only decompressed if it does not exist yet (e.g. for gold images).
+    """
+
+    def __init__(self, image, cwd, keep=None):
+        self.layers = [image] if isinstance(image, str) else image
+        self.image = self.layers[-1]
+        self.cwd = cwd
+        self.keep = keep
+        # the last layer may be in a gold checkpoint that other processes
+        # (or threads) are decompressing at the same time
+        self.raw_name = '{}.{}.{}.raw'.format(
+            self.image if keep is None else keep, getpid(), get_ident())
+        self.raw_image = '{}/{}'.format(cwd, self.raw_name)
+        if keep is not None:
+            self.kept_image = '{}/{}'.format(cwd, keep)
+
+    def __enter__(self):
+        if self.keep is None or not exists(self.kept_image):
+            if self.keep is not None:
+                makedirs(dirname(self.kept_image), exist_ok=True)
+            check_call(['{}/bin/craff'.format(self.cwd), '--decompress'] +
+                       self.layers + ['--output={}'.format(self.raw_name)],
+                       cwd=self.cwd, stdout=DEVNULL)
+            if self.keep is not None:
+                replace(self.raw_image, self.kept_image)
+        if self.keep is not None:
+            self.raw_image = self.kept_image
+        self.raw_file = open(self.raw_image, 'rb')
+        self.size = self.raw_file.seek(0, 2)
+        self.sparse = is_sparse(self.raw_file, self.size)
+        if self.size:
+            self.mmap = mmap(self.raw_file.fileno(), 0, access=ACCESS_READ)
+            self.data = memoryview(self.mmap)
+        else:
+            self.mmap = None
+            self.data = memoryview(b'')
+        return self
+
+    def __exit__(self, type_, value, traceback):
+        self.data.release()
+        if self.mmap is not None:
+            self.mmap.close()
+        self.raw_file.close()
+        if self.keep is None:
+            remove(self.raw_image)
+        if type_ is not None or value is not None or traceback is not None:
+            return False  # reraise exception
+
+    def block(self, address, block_size):
+        """
+        Returns the contents of the block at address, blocks past the end of
+        the image are zero.
+        """
+        block = self.data[address:address+block_size]
+        if len(block) < block_size:
+            return block.tobytes()+bytes(block_size-len(block))
+        return block
+
+    def nonzero_regions(self, chunk_size):
+        """
+        Yields the (start, end) offsets of the chunks of the image which are
+        not all zero, for images which are not sparse.
+        """
+        zero_chunk = bytes(chunk_size)
+        for start in range(0, self.size, chunk_size):
+            chunk = self.data[start:start+chunk_size]
+            if chunk != zero_chunk[:len(chunk)]:
+                yield start, start+len(chunk)
+
+    def data_blocks(self, block_size):
+        """
+        Yields the addresses of the blocks which may contain data.
+        """
+        if self.sparse:
+            regions = data_regions(self.raw_file, self.size)
+        else:
+            regions = self.nonzero_regions(block_size*blocks_per_chunk)
+        for start, end in regions:
+            address = start - (start % block_size)
+            while address < end:
+                yield address
+                address += block_size
+
+
+def diff_images(gold, monitored, block_size):
+    """
+    Returns the sorted addresses of the blocks that differ between two
+    entered craff_images. Chunks of blocks are compared first, so the
+    individual blocks are only compared for chunks that differ.
+    """
+    addresses = sorted(set(gold.data_blocks(block_size)) |
+                       set(monitored.data_blocks(block_size)))
+    chunk_size = block_size*blocks_per_chunk
+    changed_blocks = []
+    index = 0
+    while index < len(addresses):
+        chunk = addresses[index]
+        end = index
+        while end < len(addresses) and addresses[end] < chunk+chunk_size:
+            end += 1
+        if gold.block(chunk, chunk_size) != \
+                monitored.block(chunk, chunk_size):
+            for address in addresses[index:end]:
+                if gold.block(address, block_size) != \
+                        monitored.block(address, block_size):
+                    changed_blocks.append(address)
+        index = end
+    return changed_blocks
+
+
+def extract_blocks(image, addresses, block_size, path_format):
+    """
+    Writes the contents of each block of an entered craff_image at addresses
+    to path_format.format(address).
+    """
+    for address in addresses:
+        with open(path_format.format(address), 'wb') as block_file:
+            block_file.write(image.block(address, block_size))
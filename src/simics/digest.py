@@ -0,0 +1,227 @@
+"""
+Copyright (c) 2018 NSF Center for Space, High-performance, and Resilient Computing (SHREC)
+University of Pittsburgh. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided
+that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice,
+   this list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY EXPRESS OR IMPLIED WARRANTIES, 
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. 
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR 
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT 
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY
+OF SUCH DAMAGE.
+"""
+
+from hashlib import sha1
+from os import getpid, replace
+from os.path import exists
+from struct import pack, unpack_from
+
+from .config import data_types, new_data_list
+from .craff import craff_image
+
+# gold checkpoints do not change after a campaign is created, so the register
+# values and a hash of each block of RAM of every gold checkpoint are stored in
+# a digest file (gold-checkpoints/<campaign>/<checkpoint>.digest) which is used
+# in place of the gold checkpoint when comparing
+magic = b'DrSEUs digest 1\n'
+hash_size = sha1().digest_size
+
+
+def get_digest_file(gold_checkpoint):
+    return '{}.digest'.format(gold_checkpoint)
+
+
+def encode_value(value):
+    """
+    Encodes a register value of a config as tagged binary data. Values of any
+    other type are stored as their string.
+    """
+    if value is None:
+        return b'n'
+    elif isinstance(value, data_types):
+        data = ' '.join(value).encode()
+        return b'd'+pack('>I', len(data))+data
+    elif isinstance(value, (list, tuple)):
+        return b'l'+pack('>I', len(value)) + \
+            b''.join(encode_value(item) for item in value)
+    elif isinstance(value, dict):
+        return b'm'+pack('>I', len(value)) + \
+            b''.join(encode_value(key)+encode_value(item)
+                     for key, item in value.items())
+    elif isinstance(value, int) and not isinstance(value, bool):
+        integer = value
+    elif isinstance(value, str):
+        try:
+            integer = int(value, base=0)
+        except ValueError:
+            integer = -1
+    else:
+        value = str(value)
+        integer = -1
+    if integer >= 0:
+        data = integer.to_bytes((integer.bit_length()+7) // 8, 'big')
+        return b'i'+pack('>H', len(data))+data
+    data = str(value).encode()
+    return b's'+pack('>I', len(data))+data
+
+
+def decode_value(data, offset):
+    """
+    Decodes a value encoded by encode_value() at offset and returns it with
+    the offset of the next value. Integers are returned as hexadecimal
+    strings, as they would be read from a config.
+    """
+    tag = data[offset:offset+1]
+    offset += 1
+    if tag == b'n':
+        return None, offset
+    elif tag == b'i':
+        length = unpack_from('>H', data, offset)[0]
+        offset += 2
+        return hex(int.from_bytes(data[offset:offset+length], 'big')), \
+            offset+length
+    elif tag == b'l':
+        length = unpack_from('>I', data, offset)[0]
+        offset += 4
+        value = []
+        for _ in range(length):
+            item, offset = decode_value(data, offset)
+            value.append(item)
+        return value, offset
+    elif tag == b'm':
+        length = unpack_from('>I', data, offset)[0]
+        offset += 4
+        value = {}
+        for _ in range(length):
+            key, offset = decode_value(data, offset)
+            value[key], offset = decode_value(data, offset)
+        return value, offset
+    length = unpack_from('>I', data, offset)[0]
+    offset += 4
+    value = data[offset:offset+length].decode()
+    if tag == b'd':
+        return new_data_list(value), offset+length
+    return value, offset+length
+
+
+def hash_blocks(image, block_size):
+    """
+    Returns a dictionary of the hashes of the blocks of an entered craff_image
+    indexed by address, blocks which only contain zeros are omitted.
+    """
+    hashes = {}
+    zero_block = bytes(block_size)
+    for address in image.data_blocks(block_size):
+        block = image.block(address, block_size)
+        if block != zero_block:
+            hashes[address] = sha1(block).digest()
+    return hashes
+
+
+def hash_image(image, block_size, cwd):
+    with craff_image(image, cwd) as image:
+        return hash_blocks(image, block_size)
+
+
+def changed_blocks(gold_hashes, monitored_hashes):
+    """
+    Returns the sorted addresses of the blocks that differ between two
+    dictionaries returned by hash_blocks().
+    """
+    return sorted(
+        address for address in set(gold_hashes) | set(monitored_hashes)
+        if gold_hashes.get(address) != monitored_hashes.get(address))
+
+
+def get_hashes_file(digest_file, image_index):
+    """
+    Returns the file with the block hashes of one RAM image of a digest, which
+    is read by the driver running inside Simics.
+    """
+    return '{}.{}'.format(digest_file, image_index)
+
+
+def write_hashes(hashes_file, hashes):
+    """
+    Writes the block hashes of an image as records of a big endian 8 byte
+    address followed by the hash, unless hashes_file already exists. It is
+    renamed into place, since other processes may write it at the same time.
+    """
+    if exists(hashes_file):
+        return
+    partial_file = '{}.{}'.format(hashes_file, getpid())
+    with open(partial_file, 'wb') as hashes_data:
+        hashes_data.write(b''.join(pack('>Q', address)+hashes[address]
+                                   for address in sorted(hashes)))
+    replace(partial_file, hashes_file)
+
+
+def write_digest(digest_file, registers, images):
+    """
+    Writes the register values ({config object: {register: value}}) and the
+    block hashes of each RAM image ([(block_size, hashes), ...]) of a gold
+    checkpoint to digest_file.
+    """
+    data = [magic, pack('>I', len(registers))]
+    for config_object, object_registers in registers.items():
+        name = config_object.encode()
+        data.append(pack('>HI', len(name), len(object_registers))+name)
+        for register, value in object_registers.items():
+            name = register.encode()
+            data.append(pack('>H', len(name))+name+encode_value(value))
+    data.append(pack('>I', len(images)))
+    for block_size, hashes in images:
+        data.append(pack('>QI', block_size, len(hashes)))
+        for address in sorted(hashes):
+            data.append(pack('>Q', address)+hashes[address])
+    with open(digest_file, 'wb') as digest:
+        digest.write(b''.join(data))
+
+
+def read_digest(digest_file):
+    """
+    Returns the register values and RAM images of a digest written by
+    write_digest().
+    """
+    with open(digest_file, 'rb') as digest:
+        data = digest.read()
+    if not data.startswith(magic):
+        raise Exception('invalid digest: {}'.format(digest_file))
+    offset = len(magic)
+    registers = {}
+    num_objects = unpack_from('>I', data, offset)[0]
+    offset += 4
+    for _ in range(num_objects):
+        length, count = unpack_from('>HI', data, offset)
+        offset += 6
+        config_object = data[offset:offset+length].decode()
+        offset += length
+        registers[config_object] = {}
+        for _ in range(count):
+            length = unpack_from('>H', data, offset)[0]
+            offset += 2
+            register = data[offset:offset+length].decode()
+            offset += length
+            registers[config_object][register], offset = \
+                decode_value(data, offset)
+    images = []
+    num_images = unpack_from('>I', data, offset)[0]
+    offset += 4
+    for _ in range(num_images):
+        block_size, count = unpack_from('>QI', data, offset)
+        offset += 12
+        hashes = {}
+        for _ in range(count):
+            address = unpack_from('>Q', data, offset)[0]
+            offset += 8
+            hashes[address] = data[offset:offset+hash_size]
+            offset += hash_size
+        images.append((block_size, hashes))
+    return registers, images
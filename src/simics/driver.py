@@ -0,0 +1,213 @@
+"""
+Copyright (c) 2018 NSF Center for Space, High-performance, and Resilient Computing (SHREC)
+University of Pittsburgh. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided
+that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice,
+   this list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY EXPRESS OR IMPLIED WARRANTIES, 
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. 
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR 
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT 
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY
+OF SUCH DAMAGE.
+"""
+
+# This file is executed inside Simics with "run-python-file" and is not
+# imported by DrSEUs. It must remain compatible with the Python version
+# embedded in Simics.
+
+from hashlib import sha1
+from json import dumps, loads
+from struct import unpack_from
+
+try:
+    from cli import quiet_run_command, run_command
+except ImportError:
+    run_command = SIM_run_command
+
+    def quiet_run_command(command):
+        return SIM_run_command(command), ''
+
+drseus_result_prefix = 'DrSEUs-result:'
+# gold block hashes by hashes file, which are compared with every snapshot of
+# the same checkpoint
+drseus_gold_hashes = {}
+drseus_max_gold_hashes = 4
+
+
+def drseus_objects():
+    return list(SIM_object_iterator(None))
+
+
+def drseus_save_core_objects():
+    """
+    Remembers the objects that exist before any configuration is loaded, so
+    drseus_unload() can return Simics to this state.
+    """
+    global drseus_core_objects
+    drseus_core_objects = set(obj.name for obj in drseus_objects())
+
+
+def drseus_unload():
+    SIM_delete_objects([obj for obj in drseus_objects()
+                        if obj.name not in drseus_core_objects])
+
+
+def drseus_format(value):
+    """
+    Formats integers the same way as the values of an injection row.
+    """
+    if isinstance(value, (list, tuple)):
+        return [drseus_format(item) for item in value]
+    elif isinstance(value, bool):
+        return hex(int(value))
+    elif isinstance(value, int) or type(value).__name__ == 'long':
+        return hex(value).rstrip('L')
+    return value
+
+
+def drseus_get(config_object, attribute):
+    return SIM_get_attribute(
+        SIM_get_object(config_object), attribute)
+
+
+def drseus_set(config_object, attribute, value):
+    SIM_set_attribute(
+        SIM_get_object(config_object), attribute, value)
+
+
+def drseus_print(value):
+    print(drseus_result_prefix+dumps(value))
+
+
+def drseus_inject(config_object, attribute, index, bit):
+    """
+    Flips bit of an attribute (or of the element at index of a list
+    attribute) and returns the gold and injected values.
+    """
+    value = drseus_get(config_object, attribute)
+    if index:
+        register_list = value
+        for i in index[:-1]:
+            register_list = register_list[i]
+        gold_value = register_list[index[-1]]
+        register_list[index[-1]] = gold_value ^ (1 << bit)
+        injected_value = register_list[index[-1]]
+    else:
+        gold_value = value
+        value = injected_value = gold_value ^ (1 << bit)
+    drseus_set(config_object, attribute, value)
+    return drseus_format(gold_value), drseus_format(injected_value)
+
+
+def drseus_snapshot(registers):
+    """
+    Returns the values of the registers ({config object: [register, ...]})
+    in the same structure as the register values of a checkpoint.
+    """
+    snapshot = {}
+    for config_object, attributes in registers.items():
+        snapshot[config_object] = {}
+        for attribute in attributes:
+            try:
+                value = drseus_get(config_object, attribute)
+            except Exception:
+                value = None
+            snapshot[config_object][attribute] = drseus_format(value)
+    return snapshot
+
+
+def drseus_read_hashes(hashes_file):
+    """
+    Returns the gold block hashes of an image (written by DrSEUs as records
+    of a big endian 8 byte address and a 20 byte SHA-1 hash) by address.
+    """
+    if hashes_file not in drseus_gold_hashes:
+        if len(drseus_gold_hashes) >= drseus_max_gold_hashes:
+            drseus_gold_hashes.clear()
+        with open(hashes_file, 'rb') as hashes_data:
+            data = hashes_data.read()
+        hashes = {}
+        for offset in range(0, len(data), 28):
+            hashes[unpack_from('>Q', data, offset)[0]] = \
+                data[offset+8:offset+28]
+        drseus_gold_hashes[hashes_file] = hashes
+    return drseus_gold_hashes[hashes_file]
+
+
+def drseus_compare_image(image, block_size, hashes_file):
+    """
+    Returns the addresses of the blocks of an image object which differ from
+    the gold block hashes in hashes_file, where blocks that are all zero have
+    no hash.
+    """
+    gold_hashes = drseus_read_hashes(hashes_file)
+    image = SIM_get_object(image)
+    interface = SIM_get_interface(image, 'image')
+    zero_block = bytearray(block_size)
+    changed_blocks = []
+    for address in range(0, image.size, block_size):
+        block = bytearray(interface.get(
+            address, min(block_size, image.size-address)))
+        if block == zero_block[:len(block)]:
+            if address in gold_hashes:
+                changed_blocks.append(address)
+        else:
+            block += bytearray(block_size-len(block))
+            if gold_hashes.get(address) != sha1(bytes(block)).digest():
+                changed_blocks.append(address)
+    return changed_blocks
+
+
+def drseus_progress():
+    """
+    Returns the cycle count of the first processor and the program counter of
+    every processor, which are sampled by the watchdog to detect hangs.
+    """
+    processors = SIM_get_all_processors()
+    program_counters = {}
+    for processor in processors:
+        program_counters[processor.name] = SIM_get_interface(
+            processor, 'processor_info').get_program_counter()
+    return [SIM_cycle_count(processors[0]), program_counters]
+
+
+def drseus_iteration(steps):
+    """
+    Performs a list of steps (encoded as JSON) and prints the result of every
+    step as a single line of JSON. Execution stops at the first error, which
+    is returned with the results of the steps completed before it.
+    """
+    results = []
+    error = None
+    for step in loads(steps):
+        try:
+            if step[0] == 'inject':
+                results.append(drseus_inject(*step[1:]))
+            elif step[0] == 'run':
+                run_command('run-cycles {}'.format(step[1]))
+                results.append(None)
+            elif step[0] == 'time':
+                results.append(quiet_run_command('print-time')[1])
+            elif step[0] == 'write':
+                run_command('write-configuration {}'.format(step[1]))
+                results.append(None)
+            elif step[0] == 'snapshot':
+                results.append(drseus_snapshot(step[1]))
+            elif step[0] == 'progress':
+                results.append(drseus_progress())
+            elif step[0] == 'compare':
+                results.append([drseus_compare_image(*image)
+                                for image in step[1]])
+            else:
+                raise Exception('unknown step: {}'.format(step[0]))
+        except Exception as exception:
+            error = [step[0], str(exception)]
+            break
+    drseus_print({'results': results, 'error': error})
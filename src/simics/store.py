@@ -0,0 +1,160 @@
+"""
+Copyright (c) 2018 NSF Center for Space, High-performance, and Resilient Computing (SHREC)
+University of Pittsburgh. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided
+that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice,
+   this list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS AS IS AND ANY EXPRESS OR IMPLIED WARRANTIES, 
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. 
+IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR 
+CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT 
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY
+OF SUCH DAMAGE.
+"""
+
+from hashlib import sha256
+from json import dump, dumps, load
+from os import getcwd, listdir, makedirs, readlink, remove, rename, symlink
+from os.path import exists, join
+from shutil import copytree, rmtree
+
+from .checkpoint import checkpoint_lock
+from .config import simics_config
+
+# campaigns with the same inputs create identical gold checkpoints, so these
+# are moved to simics-workspace/gold-store/<key> (where key is a hash of the
+# inputs) and gold-checkpoints/<campaign> is a symbolic link to them, which
+# lets later campaigns reuse them instead of creating them again
+store_directory = 'simics-workspace/gold-store'
+campaign_inputs = ('architecture', 'aux', 'aux_command', 'aux_log_files',
+                   'aux_output_file', 'caches', 'checkpoints', 'dut_command',
+                   'iterations', 'kill_aux', 'kill_dut', 'log_files',
+                   'output_file')
+# the DUT in the gold checkpoints only accepts the key of the campaign which
+# created them, so it is reused along with the results of the gold execution
+campaign_fields = ('aux_output', 'checkpoints', 'cycles', 'cycles_between',
+                   'dut_output', 'execution_time', 'execution_time_max',
+                   'execution_time_stddev', 'rsakey', 'start_cycle',
+                   'start_time', 'wall_time_max')
+
+
+def get_gold_key(options):
+    """
+    Returns a hash of the options and files of a new campaign which the gold
+    checkpoints depend on.
+    """
+    inputs = {option: getattr(options, option) for option in campaign_inputs}
+    inputs['files'] = {}
+    for file_ in options.files + options.aux_files:
+        with open(join(options.directory, file_), 'rb') as input_file:
+            inputs['files'][file_] = sha256(input_file.read()).hexdigest()
+    return sha256(dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+def get_gold_checkpoints(campaign_id):
+    return 'simics-workspace/gold-checkpoints/{}'.format(campaign_id)
+
+
+def read_metadata(store):
+    with open(join(store, 'store.json'), 'r') as metadata_file:
+        return load(metadata_file)
+
+
+def write_metadata(store, metadata):
+    with open(join(store, 'store.json'), 'w') as metadata_file:
+        dump(metadata, metadata_file)
+
+
+def update_checkpoint_paths(gold_checkpoints):
+    """
+    Points the checkpoint_path of every checkpoint in gold_checkpoints (a
+    directory in simics-workspace) to the checkpoints in the same directory.
+    """
+    directory = gold_checkpoints.split('/')
+    for checkpoint in listdir(gold_checkpoints):
+        if not exists(join(gold_checkpoints, checkpoint, 'config')):
+            continue  # checkpoint digest, lock or stored gold results
+        with simics_config(join(gold_checkpoints, checkpoint),
+                           lazy=True) as config:
+            paths = config.get('sim', 'checkpoint_path')
+            new_paths = []
+            for path in paths:
+                path_list = path.split('/')
+                path_list = path_list[path_list.index('simics-workspace'):]
+                path_list[:3] = directory
+                new_paths.append('"{}/{}'.format(getcwd(),
+                                                 '/'.join(path_list)))
+            config.set('sim', 'checkpoint_path', new_paths)
+            config.save()
+
+
+def link_gold(key, campaign):
+    """
+    Links the gold checkpoints of campaign to the stored ones for key and
+    copies the results of the gold execution, returning False if nothing is
+    stored for key.
+    """
+    store = join(store_directory, key)
+    with checkpoint_lock(store_directory):
+        if not exists(join(store, 'store.json')):
+            return False
+        metadata = read_metadata(store)
+        metadata['campaigns'].append(campaign.id)
+        write_metadata(store, metadata)
+    makedirs('simics-workspace/gold-checkpoints', exist_ok=True)
+    symlink(join('..', 'gold-store', key), get_gold_checkpoints(campaign.id))
+    for field in campaign_fields:
+        setattr(campaign, field, metadata['campaign'][field])
+    if exists(join(store, 'gold')):
+        copytree(join(store, 'gold'),
+                 'campaign-data/{}/gold'.format(campaign.id))
+    return True
+
+
+def store_gold(key, campaign):
+    """
+    Moves the gold checkpoints of campaign to the store for key, unless a
+    campaign with the same inputs stored its gold checkpoints first.
+    """
+    store = join(store_directory, key)
+    gold_checkpoints = get_gold_checkpoints(campaign.id)
+    with checkpoint_lock(store_directory):
+        if exists(store):
+            return False
+        makedirs(store_directory, exist_ok=True)
+        rename(gold_checkpoints, store)
+        update_checkpoint_paths(store)
+        symlink(join('..', 'gold-store', key), gold_checkpoints)
+        if exists('campaign-data/{}/gold'.format(campaign.id)):
+            copytree('campaign-data/{}/gold'.format(campaign.id),
+                     join(store, 'gold'))
+        write_metadata(store, {
+            'campaigns': [campaign.id],
+            'campaign': {field: getattr(campaign, field)
+                         for field in campaign_fields}})
+    return True
+
+
+def release_gold(campaign_id):
+    """
+    Removes the link to the stored gold checkpoints of a campaign and deletes
+    them once no campaign uses them, returning True if they were deleted.
+    """
+    gold_checkpoints = get_gold_checkpoints(campaign_id)
+    store = join(store_directory, readlink(gold_checkpoints).split('/')[-1])
+    with checkpoint_lock(store_directory):
+        remove(gold_checkpoints)
+        metadata = read_metadata(store)
+        if campaign_id in metadata['campaigns']:
+            metadata['campaigns'].remove(campaign_id)
+        if metadata['campaigns']:
+            write_metadata(store, metadata)
+            return False
+        rmtree(store)
+    return True
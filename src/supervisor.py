@@ -46,7 +46,22 @@ class supervisor(Cmd):
         options.injections = 0
         options.latent_iterations = 0
         options.compare_all = False
+        options.compare_workers = 1
         options.extract_blocks = False
+        options.keep_simics = False
+        options.live_injection = False
+        options.driver = False
+        options.converge = False
+        options.stage_injections = False
+        options.snapshots = False
+        options.memoize = False
+        options.watchdog = None
+        options.hang_cycles = None
+        options.adaptive_timeout = None
+        options.full_speed = False
+        options.scratch = None
+        options.no_merge = False
+        options.config_cache = 0
         if options.power_switch_outlet is not None or \
                 options.power_switch_ip_address:
             switch = power_switch(options)
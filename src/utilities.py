@@ -25,8 +25,8 @@ from django.db import connection
 from hashlib import sha256
 from json import dump, load
 from multiprocessing import Process, Value
-from os import getcwd, listdir, mkdir, remove, walk
-from os.path import abspath, dirname, exists, isdir, join
+from os import getcwd, listdir, makedirs, mkdir, remove, walk
+from os.path import abspath, dirname, exists, isdir, islink, join
 from progressbar import ProgressBar
 from progressbar.widgets import Bar, Percentage, SimpleProgress, Timer
 from shutil import rmtree
@@ -43,7 +43,8 @@ from .fault_injector import fault_injector
 from .jtag import find_devices
 from .jtag.openocd import openocd
 from .power_switch import power_switch
-from .simics.config import simics_config
+from .simics.store import (get_gold_key, link_gold, release_gold,
+                           store_directory, store_gold, update_checkpoint_paths)
 from .supervisor import supervisor
 
 
@@ -229,7 +230,13 @@ def delete(options):
         if exists('campaign-data/{}'.format(options.campaign_id)):
             rmtree('campaign-data/{}'.format(options.campaign_id))
             print('deleted campaign data')
-        if exists('simics-workspace/gold-checkpoints/{}'.format(
+        if islink('simics-workspace/gold-checkpoints/{}'.format(
+                options.campaign_id)):
+            if release_gold(options.campaign_id):
+                print('deleted gold checkpoints')
+            else:
+                print('unlinked gold checkpoints used by other campaigns')
+        elif exists('simics-workspace/gold-checkpoints/{}'.format(
                 options.campaign_id)):
             rmtree('simics-workspace/gold-checkpoints/{}'.format(
                 options.campaign_id))
@@ -250,6 +257,9 @@ def delete(options):
         if exists('simics-workspace/gold-checkpoints'):
             rmtree('simics-workspace/gold-checkpoints')
             print('deleted gold checkpoints')
+        if exists(store_directory):
+            rmtree(store_directory)
+            print('deleted stored gold checkpoints')
         if exists('simics-workspace/injected-checkpoints'):
             rmtree('simics-workspace/injected-checkpoints')
             print('deleted injected checkpoints')
@@ -286,6 +296,14 @@ def create_campaign(options):
     if exists(campaign_directory):
         raise Exception('directory already exists: {}'.format(
             campaign_directory))
+    if options.simics and options.reuse_gold:
+        gold_key = get_gold_key(options)
+        if link_gold(gold_key, campaign):
+            makedirs(campaign_directory, exist_ok=True)
+            campaign.save()
+            print('created campaign {} using stored gold checkpoints'.format(
+                campaign.id))
+            return
     drseus = fault_injector(options)
     try:
         drseus.setup_campaign()
@@ -302,6 +320,8 @@ def create_campaign(options):
         drseus.debugger.close()
         return -1
     else:
+        if options.simics and options.reuse_gold:
+            store_gold(gold_key, drseus.db.campaign)
         print('created campaign {}'.format(campaign.id))
 
 
@@ -382,28 +402,19 @@ def run_django_command(options):
 
 
 def update_dependencies(*args):
-
-    def update_checkpoint_dependencies(campaign_id):
-        for checkpoint in listdir('simics-workspace/gold-checkpoints/{}'.format(
-                campaign_id)):
-            with simics_config('simics-workspace/gold-checkpoints/{}/{}'.format(
-                    campaign_id, checkpoint)) as config:
-                paths = config.get(config, 'sim', 'checkpoint_path')
-                new_paths = []
-                for path in paths:
-                    path_list = path.split('/')
-                    path_list = path_list[path_list.index('simics-workspace'):]
-                    path_list[-2] = str(campaign_id)
-                    new_paths.append('"{}/{}'.format(getcwd(),
-                                                     '/'.join(path_list)))
-                config.set(config, 'sim', 'checkpoint_path', new_paths)
-                config.save()
-
     if exists('simics-workspace/gold-checkpoints'):
         print('updating gold checkpoint path dependencies...', end='')
         stdout.flush()
         for campaign in listdir('simics-workspace/gold-checkpoints'):
-            update_checkpoint_dependencies(campaign)
+            gold_checkpoints = 'simics-workspace/gold-checkpoints/{}'.format(
+                campaign)
+            # stored gold checkpoints are updated below
+            if isdir(gold_checkpoints) and not islink(gold_checkpoints):
+                update_checkpoint_paths(gold_checkpoints)
+        if exists(store_directory):
+            for key in listdir(store_directory):
+                if isdir(join(store_directory, key)):
+                    update_checkpoint_paths(join(store_directory, key))
         print('done')
 
 
@@ -425,7 +436,9 @@ def backup(options):
     def traverse_directory(directory, archive=None, progress=None):
         num_items = 0
         for item in listdir(directory):
-            if isdir(join(directory, item)):
+            # links to stored gold checkpoints are archived as links
+            if isdir(join(directory, item)) and \
+                    not islink(join(directory, item)):
                 num_items += traverse_directory(join(directory, item), archive,
                                                 progress)
             else:
@@ -459,6 +472,8 @@ def backup(options):
         directories = ['campaign-data']
         if exists('simics-workspace/gold-checkpoints'):
             directories.append('simics-workspace/gold-checkpoints')
+        if exists(store_directory):
+            directories.append(store_directory)
         print('discovering files to archive')
         for directory in directories:
             num_items += traverse_directory(directory)
@@ -489,6 +504,8 @@ def restore(options):
                 rmtree('campaign-data')
             if exists('simics-workspace/gold-checkpoints'):
                 rmtree('simics-workspace/gold-checkpoints')
+            if exists(store_directory):
+                rmtree(store_directory)
         print('restoring files...', end='')
         stdout.flush()
         with open_tar(options.backup_file, 'r:gz') as backup: